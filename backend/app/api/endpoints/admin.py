@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from app.models.models import TracingConfig
+from app.tracing import tracer
+from typing import Dict
+
+router = APIRouter()
+
+@router.get("/admin/tracing", response_model=Dict)
+async def get_tracing():
+    return {
+        "sample_rate": tracer.current_rate(),
+        "exporting": tracer.exporter is not None
+    }
+
+@router.put("/admin/tracing", response_model=Dict)
+async def update_tracing(config: TracingConfig):
+    try:
+        tracer.set_sample_rate(config.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Could not share the sample rate with other workers: {e}")
+    return {
+        "sample_rate": tracer.sample_rate,
+        "exporting": tracer.exporter is not None
+    }
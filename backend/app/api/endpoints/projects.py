@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, Query
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from uuid import UUID
+import asyncio
+import logging
 import os
-
-# Import CLI functions directly from the CLI package
-from cli import createAPI, editAPI, revertAPI
+import shutil
 
 # Fix the database import
 from app.database import (
@@ -13,6 +13,14 @@ from app.database import (
 from app.models.models import ProjectCreate, ProjectResponse, ChatMessage
 from app.websocket import websocket_manager
 from app.dependencies import get_current_user
+from app.utils.manifest import build_manifest, diff_manifests, file_tree, manifest_size, unified_file_diff
+from app.jobs import job_manager
+from app.generator import load_cli
+from app.usage import usage_tracker
+from app.storage import project_storage
+from app.preview import PreviewSyncError, preview_sync, rebuild_reason
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -27,13 +35,14 @@ async def create_new_project(
         
         # Create initial version
         version = await db.create_version(project_data["id"], 1)
-        print(version)
+        logger.info("Project created", extra={"project_id": project_data["id"], "version_id": version["id"]})
         
         # Update project with version
         project_data["current_version_id"] = version["id"]
 
         # Need to update the project with the version id
         await db.update_project_metadata(project_data["id"], {"current_version_id": version["id"]})
+        usage_tracker.record(current_user.id, projects=1)
         
         return project_data
     except Exception as e:
@@ -46,7 +55,7 @@ async def get_user_projects(current_user = Depends(get_current_user)):
         response = await db.get_projects()
         return response
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error fetching projects", extra={"user_id": current_user.id, "error": str(e)})
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/projects/{project_id}", response_model=ProjectResponse)
@@ -61,7 +70,7 @@ async def get_project_details(
             raise HTTPException(status_code=404, detail="Project not found")
         return project
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error fetching project", extra={"project_id": str(project_id), "error": str(e)})
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/projects/{project_id}/messages")
@@ -131,6 +140,161 @@ async def get_version_use_cases(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def _get_manifests(db, project_id: str, version_ids: List[str]) -> Dict[str, Dict]:
+    """Load the manifests of versions belonging to a project, 404 if any is missing"""
+    await db.get_project(project_id)
+    versions = await db.get_version_manifests(project_id, version_ids)
+    for version_id in version_ids:
+        if version_id not in versions:
+            raise HTTPException(status_code=404, detail="Version not found")
+        if not versions[version_id].get("manifest"):
+            raise HTTPException(status_code=404, detail="Version has no file manifest")
+    return versions
+
+@router.get("/projects/{project_id}/versions/{version_id}/files")
+async def get_version_files(
+    project_id: UUID,
+    version_id: UUID,
+    current_user = Depends(get_current_user)
+):
+    """
+    Fetch the file tree of a version from its manifest.
+    """
+    try:
+        db = get_db_context(current_user.id)
+        versions = await _get_manifests(db, str(project_id), [str(version_id)])
+        return {
+            "status": "success",
+            "data": file_tree(versions[str(version_id)]["manifest"])
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/projects/{project_id}/versions/{version_a}/diff/{version_b}")
+async def get_version_diff(
+    project_id: UUID,
+    version_a: UUID,
+    version_b: UUID,
+    current_user = Depends(get_current_user)
+):
+    """
+    List files added, removed and modified between two versions, answered from their manifests.
+    """
+    try:
+        db = get_db_context(current_user.id)
+        versions = await _get_manifests(db, str(project_id), [str(version_a), str(version_b)])
+        return {
+            "status": "success",
+            "data": diff_manifests(versions[str(version_a)]["manifest"], versions[str(version_b)]["manifest"])
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/projects/{project_id}/versions/{version_a}/diff/{version_b}/file")
+async def get_version_file_diff(
+    project_id: UUID,
+    version_a: UUID,
+    version_b: UUID,
+    path: str = Query(...),
+    current_user = Depends(get_current_user)
+):
+    """
+    Fetch the unified diff of a single file between two versions.
+    """
+    try:
+        db = get_db_context(current_user.id)
+        versions = await _get_manifests(db, str(project_id), [str(version_a), str(version_b)])
+        old = versions[str(version_a)]
+        new = versions[str(version_b)]
+        diff = await asyncio.to_thread(
+            unified_file_diff,
+            old["manifest"],
+            new["manifest"],
+            path,
+            f"v{old['version_number']}",
+            f"v{new['version_number']}"
+        )
+        return {
+            "status": "success",
+            "data": {
+                "path": path,
+                "diff": diff
+            }
+        }
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found in either version")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _project_usage(db, project_id: str) -> Dict[str, int]:
+    """The usage counters a project contributes, as reconcile_usage derives them from its versions"""
+    versions = await db.get_project_versions(project_id)
+    manifests = await db.get_version_manifests(project_id, [str(v["id"]) for v in versions]) if versions else {}
+    return {
+        "generations": sum(1 for v in versions if v["version_number"] == 1 and v["status"] == "generated"),
+        "edits": sum(1 for v in versions if v["version_number"] > 1),
+        "bytes_stored": sum(manifest_size(m.get("manifest") or {}) for m in manifests.values()),
+    }
+
+async def _current_version(db, project: Dict) -> Dict:
+    """The project's current version; its backup rolls back an interrupted job and its manifest is diffed for hot applies"""
+    if not project.get("current_version_id"):
+        return {}
+    return await db.get_version(str(project["current_version_id"])) or {}
+
+def _snapshot_root(manifest: Optional[Dict], project_dir: str) -> str:
+    """Directory holding a version's own copy of its files, empty if it has none"""
+    root = (manifest or {}).get("root") or ""
+    # Versions recorded before generation was snapshotted point at the live project directory
+    if not root or not os.path.isdir(root) or os.path.abspath(root) == os.path.abspath(project_dir):
+        return ""
+    return root
+
+async def _update_preview(job, cli, project: Dict, result: Dict, old_manifest: Dict, new_manifest: Dict, hot: bool, status_callback) -> Tuple[Dict, str]:
+    """Bring the running preview up to date with the new version after the generator ran without docker.
+
+    Only the changed files are synced into the container, copied from the
+    directory the new manifest was built from. Changes to dependency manifests
+    or the Dockerfile, and failed syncs, fall back to a full rebuild through
+    the generator, restoring the same directory. Returns the preview details
+    and the URL of the container serving the preview.
+    """
+    if not hot:
+        # The generator already rebuilt the container
+        return job.preview_ready("rebuild"), result["preview_url"]
+    project_id = str(project["id"])
+    # Without docker the generator reports its local dev server, the container keeps serving at its own URL
+    preview_url = project.get("current_project_preview_url") or result["preview_url"]
+    source_dir = new_manifest["root"]
+    changes = diff_manifests(old_manifest, new_manifest)
+    reason = rebuild_reason(changes)
+    if reason is None:
+        job.enter_phase("syncing")
+        try:
+            files = await preview_sync.apply(project_id, source_dir, changes)
+            await status_callback(f"Preview updated ({files} changed files)")
+            return job.preview_ready("hot", files=files), preview_url
+        except PreviewSyncError as e:
+            logger.warning("Hot apply failed, rebuilding the preview", extra={"project_id": project_id, "error": str(e)})
+            reason = "sync failed"
+    job.enter_phase("building")
+    rebuild = await cli.revertAPI(
+        project_dir=await asyncio.to_thread(project_storage.project_dir, project_id),
+        backup_dir=source_dir,
+        broadcast_callback=status_callback,
+        use_docker=True,
+        use_nginx=False
+    )
+    if rebuild["status"] == "error":
+        raise HTTPException(status_code=500, detail=rebuild["message"])
+    return job.preview_ready("rebuild", reason=reason), rebuild["preview_url"]
+
 @router.post("/projects/{project_id}/generate")
 async def generate_project(
     project_id: UUID,
@@ -140,22 +304,23 @@ async def generate_project(
     """
     Creates a new app and generates project files.
     """
+    job = job_manager.begin("generate", str(project_id), current_user.id)
     try:
-        print(f"Starting project generation for project_id: {project_id}")
+        logger.info("Starting project generation", extra={"project_id": str(project_id)})
         db = get_db_context(current_user.id)
         project = await db.get_project(str(project_id))
 
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
-        print(f"Project found: {project}")
         # Access the current_version_id safely
         version_id = project.get('current_version_id')
         if not version_id:
             raise HTTPException(status_code=400, detail="Project has no current version")
+        previous_version = await db.get_version(str(version_id))
         
         # Define the output directory for the project
-        output_dir = os.path.join(os.getenv("PROJECT_BASE_DIR"), str(project_id))
-        print(f"Output directory set to: {output_dir}")
+        output_dir = await asyncio.to_thread(project_storage.project_dir, str(project_id))
+        logger.debug("Output directory set", extra={"project_id": str(project_id), "output_dir": output_dir})
         
         # WebSocket callback function
         async def broadcast_callback(message: str, project_id: str):
@@ -183,17 +348,19 @@ async def generate_project(
 
         # Save chat message
         await db.create_chat_message(str(project_id), message.sender, message.message, "normal")
-        print(f"Chat message saved for project_id: {project_id}")
 
         await broadcast_callback("Starting project generation", str(project_id))
         await broadcast_callback("Project directory created", str(project_id))
 
         # Update broadcast calls
         async def status_callback(msg: str):
+            job.observe_status(msg)
             await broadcast_callback(msg, str(project_id))
         
-        # Call the CLI function
-        result = await createAPI(
+        # Call the CLI function; an interrupted regeneration is rolled back to the previous generation's snapshot
+        job.start(project_dir=output_dir, restore_dir=previous_version.get("backup_dir") or "")
+        cli = await load_cli()
+        result = await cli.createAPI(
             description=message.message,
             output_dir=output_dir,
             broadcast_callback=status_callback,
@@ -201,15 +368,16 @@ async def generate_project(
             use_nginx=False
         )
        
-        print(f"createAPI result: {result}")
+        logger.info("createAPI finished", extra={"project_id": str(project_id), "status": result["status"]})
         if result["status"] == "error":
-            print(f"Error during project generation: {result['message']}")
+            logger.error("Error during project generation", extra={"project_id": str(project_id), "error": result["message"]})
             await sendMessageToFrontend("Error during project generation", "error", str(project_id))
             raise HTTPException(status_code=500, detail=result["message"])
+        preview = job.preview_ready("rebuild")
+        job.enter_phase("persisting")
         
         # Update project with generated info
         await db.update_project_status(str(project_id), "Ready")
-        print(f"Project status updated to Ready for project_id: {project_id}")
         
         
         
@@ -219,26 +387,44 @@ async def generate_project(
         #update version status to generated
         await db.update_version_status(str(version_id), "generated")
         await status_callback("Version status updated to Generated")
+        #snapshot the generated version like edits do, later edits overwrite the project directory
+        backup_dir = await asyncio.to_thread(project_storage.snapshot, result["output_dir"])
+        manifest = await asyncio.to_thread(build_manifest, backup_dir)
+        await db.update_version_snapshot(str(version_id), backup_dir, manifest)
+        if previous_version.get("backup_dir"):
+            # Snapshot of an earlier generation of this version
+            await asyncio.to_thread(shutil.rmtree, previous_version["backup_dir"], True)
+        # Same definitions as reconcile_usage: a project counts as one generation and a regeneration replaces v1's files
+        usage_tracker.record(
+            current_user.id,
+            generations=0 if previous_version.get("status") == "generated" else 1,
+            build_minutes=job.durations.get("building", 0.0) / 60,
+            bytes_stored=manifest_size(manifest) - manifest_size(previous_version.get("manifest") or {})
+        )
         #update use cases
-        print(f"Saving use cases: {result['use_cases']}")
         await db.save_version_use_cases(str(version_id), result["use_cases"])
         await status_callback("Use cases saved in DB")
         
         await sendMessageToFrontend("Project generation completed, check the project in preview and use cases in the use cases tab", "success", str(project_id))
+        job.complete()
         return {
             "status": "success",
             "data": {
                 "project_id": str(project_id),
                 "output_dir": result["output_dir"],
                 "preview_url": "http://localhost:3006",
+                "preview": preview,
                 "use_cases": result["use_cases"]
             }
         }
     
     except Exception as e:
-        print(f"Error during project generation: {e}")
+        job.fail(str(e))
+        logger.exception("Error during project generation", extra={"project_id": str(project_id)})
         await sendMessageToFrontend(f"Error during project generation: {e}", "error", str(project_id))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        job.finish()
 
 @router.post("/projects/{project_id}/edit")
 async def edit_project(
@@ -249,15 +435,15 @@ async def edit_project(
     """
     Edits an existing app and applies changes.
     """
+    job = job_manager.begin("edit", str(project_id), current_user.id)
     try:
         db = get_db_context(current_user.id)
-        print(f"Current user ID: {current_user}")
         project = await db.get_project(str(project_id))
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
         # Define project directory
-        project_dir = os.path.join(os.getenv("PROJECT_BASE_DIR"), str(project_id))
+        project_dir = await asyncio.to_thread(project_storage.project_dir, str(project_id))
         #save chat message
         await db.create_chat_message(str(project_id), message.sender, message.message, "normal")
         # WebSocket callback function
@@ -273,21 +459,32 @@ async def edit_project(
                 }
             )
         async def status_callback(msg: str):
+            job.observe_status(msg)
             await broadcast_callback(msg, str(project_id))
+        current_version = await _current_version(db, project)
+        old_manifest = current_version.get("manifest")
+        # With a running preview the generator only edits the files and the changes are synced into it
+        hot = await preview_sync.can_hot_apply(str(project_id), old_manifest)
         # Call the CLI function
-        result = await editAPI(
+        job.start(project_dir=project_dir, restore_dir=current_version.get("backup_dir") or "")
+        cli = await load_cli()
+        result = await cli.editAPI(
             project_dir=project_dir,
             description=message.message,
             broadcast_callback=status_callback,
-            use_docker=True,
+            use_docker=not hot,
             use_nginx=False
         )
         
         if result["status"] == "error":
             raise HTTPException(status_code=500, detail=result["message"])
+        #the file manifest of the new version drives the preview update and later diffs
+        manifest = await asyncio.to_thread(build_manifest, result["backup_dir"])
+        preview, preview_url = await _update_preview(job, cli, project, result, old_manifest, manifest, hot, status_callback)
+        job.enter_phase("persisting")
         
         # Create new version
-        version_number = len(db.get_project_versions(str(project_id))) + 1
+        version_number = len(await db.get_project_versions(str(project_id))) + 1
         
         version = await db.create_version(
             str(project_id),
@@ -297,28 +494,40 @@ async def edit_project(
         #update version status to generated
         await db.update_version_status(str(version["id"]), "generated")
         await status_callback("Version status updated to Generated")
+        #store the file manifest of the new version so diffs never walk the directories again
+        await db.update_version_manifest(str(version["id"]), manifest)
+        usage_tracker.record(
+            current_user.id,
+            edits=1,
+            build_minutes=job.durations.get("building", 0.0) / 60,
+            bytes_stored=manifest_size(manifest)
+        )
         #save the new version and preview url in project metadata
-        await db.update_project_metadata(str(project_id), {"current_version_id": version["id"], "current_project_preview_url": result["preview_url"]})
+        await db.update_project_metadata(str(project_id), {"current_version_id": version["id"], "current_project_preview_url": preview_url})
         await status_callback("Project metadata updated in DB")
         #update use cases
-        print(result["use_cases"])
         await db.save_version_use_cases(str(version["id"]), result["use_cases"])
         await status_callback("Use cases saved in DB")
         # Save chat message
         await broadcast_callback({"type": "success", "message": "Project generation completed, check the project in preview and use cases in the use cases tab"}, str(project_id))
+        job.complete()
         return {
             "status": "success",
             "data": {
                 "project_id": str(project_id),
                 "backup_dir": result["backup_dir"],
-                "preview_url": result["preview_url"],
+                "preview_url": preview_url,
+                "preview": preview,
                 "use_cases": result.get("use_cases", {})
             }
         }
     
     except Exception as e:
+        job.fail(str(e))
         await broadcast_callback({"type": "error", "message": f"Error during project generation: {e}"}, str(project_id))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        job.finish()
 
 @router.post("/projects/{project_id}/revert/{version_id}")
 async def revert_project(
@@ -329,6 +538,7 @@ async def revert_project(
     """
     Reverts an app to a specific version.
     """
+    job = job_manager.begin("revert", str(project_id), current_user.id)
     try:
         db = get_db_context(current_user.id)
         project = await db.get_project(str(project_id))
@@ -339,40 +549,68 @@ async def revert_project(
         if not version:
             raise HTTPException(status_code=404, detail="Version not found")
         
-        project_dir = os.path.join(os.getenv("PROJECT_BASE_DIR"), str(project_id))
+        project_dir = await asyncio.to_thread(project_storage.project_dir, str(project_id))
         
         # WebSocket callback function
         async def broadcast_callback(message: str):
-            await websocket_manager.broadcast(message)
+            job.observe_status(message)
+            await websocket_manager.broadcast_to_project(
+                str(project_id),
+                {
+                    "type": "loading",
+                    "message": message,
+                    "project_id": str(project_id),
+                    "sender": "System"
+                }
+            )
         
+        current_version = await _current_version(db, project)
+        old_manifest = current_version.get("manifest")
+        # Both manifests are known up front, so a revert that needs a new image is rebuilt right away
+        hot = (
+            bool(_snapshot_root(version.get("manifest"), project_dir))
+            and rebuild_reason(diff_manifests(old_manifest or {}, version["manifest"])) is None
+            and await preview_sync.can_hot_apply(str(project_id), old_manifest)
+        )
         # Call the CLI function
-        result = await revertAPI(
+        job.start(project_dir=project_dir, restore_dir=current_version.get("backup_dir") or "")
+        cli = await load_cli()
+        result = await cli.revertAPI(
             project_dir=project_dir,
             backup_dir=version["backup_dir"],
             broadcast_callback=broadcast_callback,
-            use_docker=True,
+            use_docker=not hot,
             use_nginx=False
         )
         
         if result["status"] == "error":
             raise HTTPException(status_code=500, detail=result["message"])
+        preview, preview_url = await _update_preview(job, cli, project, result, old_manifest, version.get("manifest"), hot, broadcast_callback)
+        job.enter_phase("persisting")
         
         # Update project status and current version
         await db.update_project_status(str(project_id), "Ready")
         await db.update_project_metadata(str(project_id), {
-            "current_version_id": str(version_id)
+            "current_version_id": str(version_id),
+            "current_project_preview_url": preview_url
         })
+        usage_tracker.record(current_user.id, reverts=1, build_minutes=job.durations.get("building", 0.0) / 60)
         
+        job.complete()
         return {
             "status": "success",
             "data": {
                 "project_id": str(project_id),
-                "preview_url": result["preview_url"]
+                "preview_url": preview_url,
+                "preview": preview
             }
         }
     
     except Exception as e:
+        job.fail(str(e))
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        job.finish()
 
 @router.delete("/projects/{project_id}")
 async def delete_project(
@@ -385,14 +623,23 @@ async def delete_project(
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        # Delete project from database
-        await db.delete_project(str(project_id))
-        
-        # Clean up project directory
-        if project["current_project_dir"]:
-            # Implement cleanup logic here
-            pass
+        # Not while a rebalance is moving the project's files
+        lock = project_storage.lock(str(project_id))
+        if lock is None:
+            raise HTTPException(status_code=503, detail="Project files are being moved, please retry shortly")
+        try:
+            # Delete project from database, its versions go with it
+            usage = await _project_usage(db, str(project_id))
+            await db.delete_project(str(project_id))
+            usage_tracker.record(current_user.id, projects=-1, **{name: -value for name, value in usage.items()})
+            
+            # Clean up the project directory and its backups
+            await asyncio.to_thread(project_storage.remove, str(project_id))
+        finally:
+            lock.close()
         
         return {"status": "success", "message": "Project deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
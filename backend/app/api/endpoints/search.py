@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.database import get_db_context
+from app.dependencies import get_current_user
+
+router = APIRouter()
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user = Depends(get_current_user)
+):
+    """
+    Full-text search over the user's project names and descriptions, use cases and chat history.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    try:
+        db = get_db_context(current_user.id)
+        data = await db.search(q.strip(), limit=limit, offset=offset)
+        return {
+            "status": "success",
+            "data": {**data, "limit": limit, "offset": offset}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.dependencies import get_current_user
 from app.database import supabase
 from app.models.models import UserBase
+from app.usage import usage_tracker
 from typing import Dict
 
 router = APIRouter()
@@ -47,10 +48,10 @@ async def update_profile(
 
 @router.get("/settings/usage", response_model=Dict)
 async def get_usage(current_user = Depends(get_current_user)):
-    # Placeholder for usage statistics
-    return {
-        "message": "Usage statistics coming soon"
-    }
+    try:
+        return await usage_tracker.get_usage(current_user.id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/settings/subscription", response_model=Dict)
 async def get_subscription(current_user = Depends(get_current_user)):
@@ -5,6 +5,41 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     PROJECT_BASE_DIR: str = "./projects"
+    PROJECT_STORAGE_ROOTS: str = ""  # Comma separated roots, e.g. one per disk; PROJECT_BASE_DIR is used when empty
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # Per-module overrides, e.g. "app.websocket=WARNING,app.database=DEBUG"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_MAX_FIELD_LENGTH: int = 500  # Longer messages and payload fields are truncated
+    # Tracing
+    TRACE_SAMPLE_RATE: float = 1.0  # Fraction of requests traced, can be changed at runtime for all workers via /api/admin/tracing
+    TRACE_EXPORT_PATH: str = ""  # Append sampled traces as OTLP/JSON lines to this file when set
+    # Server
+    SERVER_MODE: str = "development"  # "production" runs multiple workers without the reloader
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 2
+    PRELOAD_GENERATOR: bool = False  # Import the generator at startup instead of on the first job
+    # WebSockets
+    WS_QUEUE_SIZE: int = 100  # Outbound messages buffered per connection
+    WS_HEARTBEAT_INTERVAL: float = 20.0  # Seconds between server pings
+    WS_IDLE_TIMEOUT: float = 60.0  # Connections that leave a ping unanswered for this long are closed
+    WS_SEND_TIMEOUT: float = 10.0  # A single send taking longer than this closes the connection
+    # Usage statistics
+    USAGE_FLUSH_INTERVAL: float = 10.0  # Seconds between batched writes of usage counters
+    USAGE_FLUSH_BATCH_SIZE: int = 500  # Flush early once this many users have pending deltas
+    USAGE_RECONCILE_INTERVAL: float = 21600.0  # Seconds between reconciliation runs, 0 disables it
+    # Jobs
+    JOB_JOURNAL_DIR: str = "./journal"  # One append-only journal per worker, replayed on startup
+    JOB_DRAIN_TIMEOUT: float = 600.0  # Seconds in-flight jobs get to finish after SIGTERM
+    # Previews
+    PREVIEW_HOT_RELOAD: bool = False  # Sync changed files into the running preview instead of rebuilding it
+    PREVIEW_CONTAINER: str = "{project_id}"  # Docker container name of a project's preview
+    PREVIEW_APP_DIR: str = "/app"  # Directory of the app inside the preview container
+    PREVIEW_RELOAD_COMMAND: str = ""  # Run in the container after syncing, dev servers watching their files need none
+    PREVIEW_SYNC_TIMEOUT: float = 60.0  # Seconds a single docker command may take
+    # Token for the /api/admin endpoints, admin endpoints are disabled when empty
+    ADMIN_TOKEN: str = ""
     
     class Config:
         env_file = ".env"
@@ -4,14 +4,24 @@ from dotenv import load_dotenv
 from typing import Optional, List, Dict
 from datetime import datetime
 from fastapi import HTTPException
+import logging
+from app.metrics import instrument_queries
+from app.tracing import traced_methods
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 supabase: Client = create_client(
     os.getenv("SUPABASE_URL"),
     os.getenv("SUPABASE_KEY")
 )
 
+# Version listings leave out the file manifest, which can be large
+VERSION_LIST_COLUMNS = "id, project_id, version_number, backup_dir, status, created_at"
+
+@traced_methods("db")
+@instrument_queries
 class DatabaseContext:
     def __init__(self, user_id: str):
         self.user_id = user_id
@@ -33,7 +43,7 @@ class DatabaseContext:
     async def get_projects(self) -> List[Dict]:
         """Get all projects for the current user"""
         response = supabase.table('projects').select("*").eq('user_id', self.user_id).execute()
-        print(response.data)
+        logger.debug("Fetched projects", extra={"user_id": self.user_id, "count": len(response.data)})
         return response.data
     
     async def get_project(self, project_id: str) -> Dict:
@@ -42,6 +52,10 @@ class DatabaseContext:
             raise HTTPException(status_code=404, detail="Project not found")
         return response.data
     
+    async def project_exists(self, project_id: str) -> bool:
+        response = supabase.table('projects').select("id").eq('id', project_id).eq('user_id', self.user_id).execute()
+        return bool(response.data)
+    
     async def update_project_status(self, project_id: str, status: str) -> Dict:
         response = supabase.table('projects').update({"status": status}).eq('id', project_id).eq('user_id', self.user_id).execute()
         return response.data[0]
@@ -76,9 +90,24 @@ class DatabaseContext:
     
     async def get_project_versions(self, project_id: str) -> List[Dict]:
         """Get all versions for a project"""
-        response = supabase.table('versions').select("*").eq('project_id', project_id).order('version_number').execute()
+        response = supabase.table('versions').select(VERSION_LIST_COLUMNS).eq('project_id', project_id).order('version_number').execute()
         return response.data
     
+    async def get_version_manifests(self, project_id: str, version_ids: List[str]) -> Dict[str, Dict]:
+        """Get the file manifests of the given versions of a project, keyed by version id"""
+        response = supabase.table('versions').select("id, version_number, manifest").eq('project_id', project_id).in_('id', version_ids).execute()
+        return {row["id"]: row for row in response.data}
+    
+    async def update_version_manifest(self, version_id: str, manifest: Dict) -> Dict:
+        """Store the precomputed file manifest alongside a version"""
+        response = supabase.table('versions').update({"manifest": manifest}).eq('id', version_id).execute()
+        return response.data[0]
+    
+    async def update_version_snapshot(self, version_id: str, backup_dir: str, manifest: Dict) -> Dict:
+        """Point a version at its backup directory and store the manifest built from it"""
+        response = supabase.table('versions').update({"backup_dir": backup_dir, "manifest": manifest}).eq('id', version_id).execute()
+        return response.data[0]
+    
     async def get_chat_messages(self, project_id: str) -> List[Dict]:
         """Get all chat messages for a project"""
         response = supabase.table('chat_messages').select("*").eq('project_id', project_id).order('created_at').execute()
@@ -116,11 +145,26 @@ class DatabaseContext:
         try:
             # Insert all use cases at once
             response = supabase.table('use_cases').insert(formatted_use_cases).execute()
-            print(f"Use cases saved successfully: {response.data}")
+            logger.info("Use cases saved", extra={"version_id": version_id, "count": len(response.data)})
             return response.data
         except Exception as e:
-            print(f"Error saving use cases: {e}")
+            logger.error("Error saving use cases", extra={"version_id": version_id, "error": str(e)})
             raise e
+    async def search(self, query: str, limit: int = 20, offset: int = 0) -> Dict:
+        """Ranked full-text matches over the user's projects, use cases and chat messages"""
+        response = supabase.rpc('search_user_content', {
+            "p_user_id": self.user_id,
+            "p_query": query,
+            "p_limit": limit,
+            "p_offset": offset
+        }).execute()
+        rows = response.data or []
+        # Every row carries the total number of matches across all pages
+        return {
+            "results": [{k: v for k, v in row.items() if k != "total"} for row in rows],
+            "total": rows[0]["total"] if rows else 0
+        }
+
     #function to update version status
     async def update_version_status(self, version_id: str, status: str) -> None:
         response = supabase.table('versions').update({"status": status}).eq('id', version_id).execute()
@@ -1,9 +1,13 @@
 from fastapi import Depends, HTTPException, Header
 from typing import Optional
 from .database import supabase
+from .config import get_settings
+from .tracing import traced
+import hmac
 import jwt
 from jwt.exceptions import InvalidTokenError
 
+@traced("auth.get_current_user")
 async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization or not authorization.startswith('Bearer '):
         raise HTTPException(
@@ -32,4 +36,9 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
             status_code=401,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
-        ) 
\ No newline at end of file
+        ) 
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    admin_token = get_settings().ADMIN_TOKEN
+    if not admin_token or not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,38 @@
+import asyncio
+import importlib
+import logging
+import sys
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# The CLI project lives next to this repository
+CLI_PATH = Path(__file__).parent.parent.parent.parent / "oneShotCodeGen" / "src"
+
+_cli: Optional[ModuleType] = None
+
+
+def _import_cli() -> ModuleType:
+    global _cli
+    if _cli is None:
+        if str(CLI_PATH) not in sys.path:
+            sys.path.append(str(CLI_PATH))
+        start = time.perf_counter()
+        _cli = importlib.import_module("cli")
+        logger.info("Generator loaded", extra={"seconds": round(time.perf_counter() - start, 3)})
+    return _cli
+
+
+async def load_cli() -> ModuleType:
+    """Return the generator's ``cli`` module, importing it on first use.
+
+    The generator pulls in outlines, numpy and openai, so it is only imported
+    when a job actually needs it (or at startup with PRELOAD_GENERATOR). The
+    import runs in a thread so the event loop keeps serving other requests.
+    """
+    if _cli is not None:
+        return _cli
+    return await asyncio.to_thread(_import_cli)
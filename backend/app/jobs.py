@@ -0,0 +1,274 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import shutil
+import signal
+import time
+import uuid
+from typing import Dict, IO, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.database import get_db_context
+from app.metrics import JobMetrics
+from app.storage import project_storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only, files of dead workers are recovered on restart
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_PHASES = ("completed", "failed", "recovered")
+
+
+def _write_entry(file: IO, job_id: str, phase: str, **details):
+    # Written straight to the OS so the entry survives the process being killed
+    file.write(json.dumps({"job_id": job_id, "phase": phase, "ts": time.time(), **details}) + "\n")
+    file.flush()
+
+
+class JobJournal:
+    """Append-only JSON lines file recording the phases of the jobs of one worker.
+
+    The worker holds an exclusive lock on its journal for as long as it is
+    alive, so a journal that can be locked by someone else belongs to a worker
+    that died and its unfinished jobs can safely be recovered.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        name = f"jobs-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl"
+        self.path = os.path.join(directory, name)
+        # Created and locked under a name other workers do not look at, so none of them can take it for orphaned
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        self.file = open(tmp_path, "a", encoding="utf-8")
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(tmp_path, self.path)
+
+    def append(self, job_id: str, phase: str, **details):
+        _write_entry(self.file, job_id, phase, **details)
+
+    def close(self, remove: bool):
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+
+    def orphaned_journals(self) -> List[Tuple[str, IO]]:
+        """Journals of other workers that are no longer running, returned locked by this worker"""
+        orphaned = []
+        for path in glob.glob(os.path.join(self.directory, ".jobs-*.jsonl.tmp")):
+            # Left behind by a worker that died before its journal was in place, it has no entries
+            with open(path, "a") as f:
+                if fcntl:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                os.remove(path)
+        for path in sorted(glob.glob(os.path.join(self.directory, "jobs-*.jsonl"))):
+            if path == self.path:
+                continue
+            f = open(path, "a")
+            if fcntl:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()
+                    continue  # Still locked by a live worker
+            orphaned.append((path, f))
+        return orphaned
+
+
+def read_journal(path: str) -> Dict[str, Dict]:
+    """Replay a journal into the latest state of each job"""
+    jobs: Dict[str, Dict] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn last line of a crashed worker
+            jobs.setdefault(entry["job_id"], {}).update(entry)
+    return jobs
+
+
+class Job(JobMetrics):
+    """A generate, edit or revert job, recorded in the journal as it moves through its phases"""
+
+    def __init__(self, manager: "JobManager", operation: str, project_id: str, user_id: str):
+        super().__init__(operation)
+        self.manager = manager
+        self.job_id = uuid.uuid4().hex
+        self.project_id = project_id
+        self.terminal = False
+        self.lock: Optional[IO] = None
+        manager.journal.append(self.job_id, "queued", operation=operation, project_id=project_id, user_id=str(user_id))
+
+    def start(self, project_dir: str = "", restore_dir: str = ""):
+        """Record where the job writes and how to roll it back, then start it.
+
+        ``restore_dir`` is a backup of the project directory as it was before
+        the job, if one exists.
+        """
+        self.manager.journal.append(
+            self.job_id,
+            "started",
+            project_dir=project_dir,
+            dir_existed=bool(project_dir) and os.path.exists(project_dir),
+            restore_dir=restore_dir,
+        )
+        super().start()
+
+    def enter_phase(self, phase: str):
+        if phase != self.phase:
+            self.manager.journal.append(self.job_id, phase)
+        super().enter_phase(phase)
+
+    def complete(self):
+        self._end("completed")
+
+    def fail(self, error: str):
+        self._end("failed", error=error[:500])
+
+    def _end(self, phase: str, **details):
+        if not self.terminal:
+            self.terminal = True
+            self.manager.journal.append(self.job_id, phase, **details)
+
+    def finish(self):
+        super().finish()
+        # A job left without a terminal phase was cancelled and is recovered on the next startup
+        self.manager._finished(self)
+
+
+class JobManager:
+    def __init__(self):
+        self.journal: Optional[JobJournal] = None
+        self.accepting = True
+        self.in_flight: Dict[str, Job] = {}
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._unfinished = 0
+
+    def begin(self, operation: str, project_id: str, user_id: str) -> Job:
+        if not self.accepting or self.journal is None:
+            raise HTTPException(status_code=503, detail="Server is shutting down, please retry shortly")
+        # Held until the job finishes so the project's files are not moved by a rebalance meanwhile
+        lock = project_storage.lock(project_id)
+        if lock is None:
+            raise HTTPException(status_code=503, detail="Project files are being moved, please retry shortly")
+        job = Job(self, operation, project_id, user_id)
+        job.lock = lock
+        self.in_flight[job.job_id] = job
+        self._idle.clear()
+        return job
+
+    def _finished(self, job: Job):
+        self.in_flight.pop(job.job_id, None)
+        if job.lock:
+            job.lock.close()
+            job.lock = None
+        if not job.terminal:
+            self._unfinished += 1
+        if not self.in_flight:
+            self._idle.set()
+
+    async def open(self, directory: str):
+        self.journal = JobJournal(directory)
+        for path, locked in self.journal.orphaned_journals():
+            try:
+                await self.recover(path, locked)
+            finally:
+                locked.close()
+
+    def stop_accepting(self):
+        if self.accepting:
+            self.accepting = False
+            logger.info("No longer accepting jobs", extra={"in_flight": len(self.in_flight)})
+
+    async def drain(self, timeout: float):
+        """Stop accepting jobs and wait up to ``timeout`` seconds for in-flight ones"""
+        self.stop_accepting()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Jobs still running at shutdown, they will be recovered on restart", extra={"in_flight": len(self.in_flight)})
+        if self.journal:
+            self.journal.close(remove=not self.in_flight and not self._unfinished)
+            self.journal = None
+
+    def install_signal_handler(self):
+        """Stop accepting jobs as soon as SIGTERM arrives, before the server starts draining"""
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def handler(signum, frame):
+                self.stop_accepting()
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError:
+            pass  # Not running in the main thread
+
+    async def recover(self, path: str, journal: IO):
+        """Fail the unfinished jobs of a dead worker and roll back their directories.
+
+        Progress is appended to the orphaned journal itself: a job is rolled
+        back at most once, even if updating the database fails and is retried
+        on the next startup, and recovered jobs are never touched again. The
+        journal is only removed once every job was recovered.
+        """
+        recovered = True
+        for job_id, job in read_journal(path).items():
+            if job.get("phase") in TERMINAL_PHASES:
+                continue
+            logger.warning("Recovering interrupted job", extra={"job_id": job_id, "operation": job.get("operation"), "project_id": job.get("project_id"), "phase": job.get("phase")})
+            try:
+                if job.get("phase") != "rolled_back":
+                    restored = await asyncio.to_thread(self._rollback, job)
+                    _write_entry(journal, job_id, "rolled_back", restored=restored)
+                    job["restored"] = restored
+                db = get_db_context(job["user_id"])
+                # A project deleted since then needs no status
+                if await db.project_exists(job["project_id"]):
+                    await db.update_project_status(job["project_id"], "Failed")
+                    if job.get("restored", True):
+                        message = "The last request was interrupted by a server restart, please try again"
+                    else:
+                        message = "The last request was interrupted by a server restart and its partial changes could not be rolled back, please try again"
+                    await db.create_chat_message(job["project_id"], "System", message, "error")
+                _write_entry(journal, job_id, "recovered")
+            except Exception as e:
+                logger.error("Job recovery failed", extra={"job_id": job_id, "error": str(e)})
+                recovered = False
+        if recovered:
+            os.remove(path)
+
+    @staticmethod
+    def _rollback(job: Dict) -> bool:
+        """Put the project directory back the way it was before the job, False if that is not possible"""
+        project_dir = job.get("project_dir")
+        if not project_dir or not os.path.exists(project_dir):
+            return True
+        if not job.get("dir_existed"):
+            # Partially generated project, nothing worth keeping
+            shutil.rmtree(project_dir)
+            return True
+        restore_dir = job.get("restore_dir")
+        # A backup that is the project directory itself cannot undo anything
+        if restore_dir and os.path.isdir(restore_dir) and os.path.abspath(restore_dir) != os.path.abspath(project_dir):
+            shutil.rmtree(project_dir)
+            shutil.copytree(restore_dir, project_dir)
+            return True
+        return False
+
+
+# Create a shared instance
+job_manager = JobManager()
@@ -1,17 +1,38 @@
-import sys
-from pathlib import Path
-
-# Add the CLI project root to Python path
-cli_path = Path(__file__).parent.parent.parent.parent / "oneShotCodeGen" / "src"
-sys.path.append(str(cli_path))
+import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import projects, settings
+from app.api.endpoints import projects, settings, admin, search
 from app.websocket import websocket_manager
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, require_admin_token
+from app.metrics import PrometheusMiddleware, metrics_endpoint
+from app.config import get_settings
+from app.logging_config import configure_logging
+from app.tracing import TracingMiddleware, tracer
+from app.generator import load_cli
+from app.usage import usage_tracker
+from app.jobs import job_manager
 from .database import supabase
-app = FastAPI(title="OneShotCodeGen API")
+
+configure_logging(get_settings())
+tracer.configure(get_settings())
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if settings.PRELOAD_GENERATOR:
+        await load_cli()
+    # Recover jobs interrupted by a crash or restart before accepting new ones
+    await job_manager.open(settings.JOB_JOURNAL_DIR)
+    job_manager.install_signal_handler()
+    usage_tracker.start()
+    yield
+    await job_manager.drain(settings.JOB_DRAIN_TIMEOUT)
+    await usage_tracker.stop()
+
+app = FastAPI(title="OneShotCodeGen API", lifespan=lifespan)
 
 # Update CORS middleware configuration
 app.add_middleware(
@@ -21,6 +42,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
+app.add_middleware(TracingMiddleware)
+
+# Prometheus scrape endpoint
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 # Include routers
 app.include_router(
@@ -35,6 +61,18 @@ app.include_router(
     tags=["settings"],
     dependencies=[Depends(get_current_user)]
 )
+app.include_router(
+    search.router,
+    prefix="/api",
+    tags=["search"],
+    dependencies=[Depends(get_current_user)]
+)
+app.include_router(
+    admin.router,
+    prefix="/api",
+    tags=["admin"],
+    dependencies=[Depends(require_admin_token)]
+)
 
 # WebSocket endpoint with authentication
 @app.websocket("/ws")
@@ -50,15 +88,16 @@ async def websocket_endpoint(websocket: WebSocket, token: str,project_id: str):
             await websocket.close(code=4001)
             return
             
-        await websocket_manager.connect(websocket, project_id)
+        connection = await websocket_manager.connect(websocket, project_id)
         try:
             while True:
                 data = await websocket.receive_text()
-                print(f"Received message: project_id: {project_id} and data: {data}")
-                # Handle incoming WebSocket messages
+                logger.debug("Received WebSocket message", extra={"project_id": project_id, "payload": data})
+                # Answer pings and keep the connection alive
+                websocket_manager.handle_message(connection, data)
         except Exception as e:
-            print(f"WebSocket error: {e}")
+            logger.info("WebSocket closed", extra={"project_id": project_id, "reason": str(e)})
         finally:
-            await websocket_manager.disconnect(websocket)
+            await websocket_manager.disconnect(project_id, connection)
     except Exception as e:
         await websocket.close(code=4001) 
\ No newline at end of file
@@ -0,0 +1,231 @@
+import functools
+import inspect
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.tracing import record_span
+
+# Buckets for long running jobs (generation, docker builds), in seconds
+JOB_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "DatabaseContext method latency",
+    ["method"],
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total",
+    "DatabaseContext method errors",
+    ["method"],
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_active_connections",
+    "Active WebSocket connections in this worker",
+    multiprocess_mode="all",
+)
+WEBSOCKET_DROPPED_MESSAGES = Counter(
+    "websocket_dropped_messages_total",
+    "Outbound WebSocket messages coalesced or dropped because a send queue was full",
+    ["reason"],
+)
+BROADCAST_SECONDS = Histogram(
+    "websocket_broadcast_duration_seconds",
+    "Time spent in broadcast_to_project",
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "job_queue_depth",
+    "Jobs accepted but not started yet",
+    ["operation"],
+    multiprocess_mode="livesum",
+)
+JOB_WAIT_SECONDS = Histogram(
+    "job_wait_duration_seconds",
+    "Time between a job being accepted and the generator starting",
+    ["operation"],
+)
+JOB_PHASE_SECONDS = Histogram(
+    "job_phase_duration_seconds",
+    "Duration of each job phase",
+    ["operation", "phase"],
+    buckets=JOB_BUCKETS,
+)
+JOB_PREVIEW_SECONDS = Histogram(
+    "job_preview_ready_seconds",
+    "Time from a job starting until its preview shows the result",
+    ["operation", "mode"],
+    buckets=JOB_BUCKETS,
+)
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording latency for every HTTP request.
+
+    Requests are labelled with the route template (``/api/projects/{project_id}``)
+    rather than the raw path so that label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            ).observe(time.perf_counter() - start)
+
+
+def observe_latency(histogram: Histogram) -> Callable:
+    """Decorator observing the duration of an async function in a histogram.
+
+    prometheus_client's own ``Histogram.time()`` only times the creation of
+    the coroutine, not its execution.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_query(func: Callable) -> Callable:
+    """Record latency and errors of an async database method"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            DB_QUERY_ERRORS.labels(method=name).inc()
+            raise
+        finally:
+            DB_QUERY_SECONDS.labels(method=name).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument_queries(cls):
+    """Class decorator applying timed_query to every public async method"""
+    for name, member in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(member):
+            setattr(cls, name, timed_query(member))
+    return cls
+
+
+class JobMetrics:
+    """Tracks one generate/edit/revert job from acceptance to completion.
+
+    Phases are ``generating``, ``building``, ``syncing`` and ``persisting``;
+    the building phase is detected from the generator's own status messages.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.accepted_at = time.perf_counter()
+        self.started = False
+        self.started_at = 0.0
+        self.preview: Dict = {}
+        self.phase: Optional[str] = None
+        self.phase_started_at = 0.0
+        self.durations: Dict[str, float] = {}
+        JOB_QUEUE_DEPTH.labels(operation=operation).inc()
+
+    def start(self):
+        """Mark the job as picked up, ending its wait in the queue"""
+        if self.started:
+            return
+        self.started = True
+        self.started_at = time.perf_counter()
+        JOB_QUEUE_DEPTH.labels(operation=self.operation).dec()
+        JOB_WAIT_SECONDS.labels(operation=self.operation).observe(time.perf_counter() - self.accepted_at)
+        self.enter_phase("generating")
+
+    def enter_phase(self, phase: str):
+        if phase == self.phase:
+            return
+        self._close_phase()
+        self.phase = phase
+        self.phase_started_at = time.perf_counter()
+
+    def observe_status(self, message: str):
+        """Advance phases based on a generator status message"""
+        if isinstance(message, str) and ("docker" in message.lower() or "build" in message.lower()):
+            self.enter_phase("building")
+
+    def preview_ready(self, mode: str, **details) -> Dict:
+        """Record how long the user waited for the preview; mode is ``hot`` or ``rebuild``"""
+        seconds = time.perf_counter() - self.started_at
+        JOB_PREVIEW_SECONDS.labels(operation=self.operation, mode=mode).observe(seconds)
+        record_span("job.preview_ready", seconds, operation=self.operation, mode=mode)
+        self.preview = {"mode": mode, "seconds": round(seconds, 3), **details}
+        return self.preview
+
+    def finish(self):
+        if not self.started:
+            JOB_QUEUE_DEPTH.labels(operation=self.operation).dec()
+            self.started = True
+        self._close_phase()
+        self.phase = None
+
+    def _close_phase(self):
+        if self.phase:
+            duration = time.perf_counter() - self.phase_started_at
+            self.durations[self.phase] = self.durations.get(self.phase, 0.0) + duration
+            JOB_PHASE_SECONDS.labels(operation=self.operation, phase=self.phase).observe(duration)
+            record_span(f"cli.{self.phase}", duration, operation=self.operation)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Expose metrics in the Prometheus text format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (multi-worker deployments) the
+    values of all workers are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
@@ -39,4 +39,6 @@ class ChatMessage(BaseModel):
 
 class UseCase(BaseModel):
     title: str
-    description: str 
\ No newline at end of file
+    description: str 
+class TracingConfig(BaseModel):
+    sample_rate: float
@@ -0,0 +1,117 @@
+import asyncio
+import io
+import logging
+import os
+import posixpath
+import tarfile
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Changes to these files need a new image (installed packages, build steps), syncing them is not enough
+REBUILD_FILES = {
+    "package.json", "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "requirements.txt", "pyproject.toml", "poetry.lock", "Pipfile", "Pipfile.lock",
+    "docker-compose.yml", "docker-compose.yaml", "compose.yml", "compose.yaml", ".dockerignore",
+}
+
+
+class PreviewSyncError(Exception):
+    pass
+
+
+def rebuild_reason(changes: Dict[str, List[Dict]]) -> Optional[str]:
+    """The first changed file that requires a full image rebuild, None if syncing files is enough"""
+    for kind in ("added", "removed", "modified"):
+        for entry in changes.get(kind, []):
+            name = posixpath.basename(entry["path"])
+            if name in REBUILD_FILES or name.startswith("Dockerfile"):
+                return entry["path"]
+    return None
+
+
+def _changed_files_tar(source_dir: str, paths: List[str]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for path in paths:
+            tar.add(os.path.join(source_dir, path), arcname=path, recursive=False)
+    return buffer.getvalue()
+
+
+class PreviewSync:
+    """Applies a version's changed files to its already running preview container.
+
+    Only the files that differ between two manifests are copied into the
+    container, in a single ``docker cp`` tar stream, and removed files are
+    deleted. The app's dev server picks the changes up through its own file
+    watcher, or through ``reload_command`` when one is configured.
+    """
+
+    def __init__(self, enabled: bool, container: str, app_dir: str, reload_command: str = "", timeout: float = 60.0):
+        self.enabled = enabled
+        self.container = container
+        self.app_dir = app_dir
+        self.reload_command = reload_command
+        self.timeout = timeout
+
+    def container_name(self, project_id: str) -> str:
+        return self.container.format(project_id=project_id)
+
+    async def _docker(self, *args: str, stdin: Optional[bytes] = None) -> str:
+        process = await asyncio.create_subprocess_exec(
+            "docker", *args,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(stdin), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise PreviewSyncError(f"docker {args[0]} timed out")
+        if process.returncode != 0:
+            raise PreviewSyncError(f"docker {args[0]} failed: {stderr.decode(errors='replace').strip()}")
+        return stdout.decode(errors="replace").strip()
+
+    async def can_hot_apply(self, project_id: str, manifest: Optional[Dict]) -> bool:
+        """Hot applying needs the mode enabled, a manifest to diff against and a running container"""
+        if not self.enabled or not manifest:
+            return False
+        try:
+            running = await self._docker("inspect", "-f", "{{.State.Running}}", self.container_name(project_id))
+        except (OSError, PreviewSyncError) as e:
+            logger.info("Preview container not available, using a full rebuild", extra={"project_id": project_id, "error": str(e)})
+            return False
+        return running == "true"
+
+    async def apply(self, project_id: str, source_dir: str, changes: Dict[str, List[Dict]]) -> int:
+        """Copy added and modified files into the container and delete removed ones, returns the number of files touched"""
+        container = self.container_name(project_id)
+        copied = [entry["path"] for entry in changes["added"] + changes["modified"]]
+        removed = [entry["path"] for entry in changes["removed"]]
+        try:
+            if copied:
+                archive = await asyncio.to_thread(_changed_files_tar, source_dir, copied)
+                await self._docker("cp", "-", f"{container}:{self.app_dir}", stdin=archive)
+            if removed:
+                await self._docker("exec", "-w", self.app_dir, container, "rm", "-f", "--", *removed)
+            if self.reload_command:
+                await self._docker("exec", "-w", self.app_dir, container, "sh", "-c", self.reload_command)
+        except OSError as e:
+            raise PreviewSyncError(str(e))
+        logger.info("Preview hot applied", extra={"project_id": project_id, "copied": len(copied), "removed": len(removed)})
+        return len(copied) + len(removed)
+
+
+# Create a shared instance
+_settings = get_settings()
+preview_sync = PreviewSync(
+    enabled=_settings.PREVIEW_HOT_RELOAD,
+    container=_settings.PREVIEW_CONTAINER,
+    app_dir=_settings.PREVIEW_APP_DIR,
+    reload_command=_settings.PREVIEW_RELOAD_COMMAND,
+    timeout=_settings.PREVIEW_SYNC_TIMEOUT,
+)
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import shutil
+import time
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from app.config import get_settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking, only rebalance while the server is stopped
+    fcntl = None
+
+# Generated projects and their backups are stored as <root>/<ab>/<cd>/<project_id>[_backup_<ts>]
+FANOUT_LEVELS = 2
+FANOUT_WIDTH = 2
+BACKUP_MARKER = "_backup_"
+TMP_SUFFIX = ".rebalance-tmp"
+
+
+def _score(root: str, project_id: str) -> int:
+    return int.from_bytes(hashlib.sha256(f"{root}\0{project_id}".encode()).digest()[:8], "big")
+
+
+class ProjectStorage:
+    """Places project directories across several storage roots.
+
+    A project's root is chosen by rendezvous (highest random weight) hashing,
+    so adding a root only moves the projects that now hash to the new root
+    and every other placement stays where it is. Within a root, two levels of
+    fan-out directories derived from a hash of the project id keep every
+    directory small.
+
+    All code resolves project paths through ``project_dir`` instead of joining
+    paths by hand, which also finds projects that have not been moved yet
+    after a root was added. Jobs hold a shared ``lock`` on their project while
+    they use its files and rebalancing takes it exclusively, so a project is
+    never moved while it is in use.
+    """
+
+    def __init__(self, roots: List[str], lock_dir: str):
+        if not roots:
+            raise ValueError("At least one project storage root is required")
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.lock_dir = lock_dir
+
+    def lock(self, project_id: str, exclusive: bool = False) -> Optional[IO]:
+        """Lock a project's files, returns the open lock file or None if the project is locked the other way"""
+        os.makedirs(self.lock_dir, exist_ok=True)
+        f = open(os.path.join(self.lock_dir, f"{project_id}.lock"), "a")
+        if fcntl:
+            try:
+                fcntl.flock(f.fileno(), (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return None
+        return f
+
+    def root_for(self, project_id: str) -> str:
+        """The root a project belongs on"""
+        return max(self.roots, key=lambda root: _score(root, str(project_id)))
+
+    def shard_dir(self, root: str, project_id: str) -> str:
+        digest = hashlib.sha1(str(project_id).encode()).hexdigest()
+        parts = [digest[i * FANOUT_WIDTH:(i + 1) * FANOUT_WIDTH] for i in range(FANOUT_LEVELS)]
+        return os.path.join(root, *parts)
+
+    def placement(self, project_id: str) -> str:
+        """Where a project's directory belongs, whether or not it exists yet"""
+        return os.path.join(self.shard_dir(self.root_for(project_id), project_id), str(project_id))
+
+    def locate(self, project_id: str) -> Optional[str]:
+        """The existing directory of a project, on any root"""
+        candidates = [self.placement(project_id)]
+        for root in self.roots:
+            candidates.append(os.path.join(self.shard_dir(root, project_id), str(project_id)))
+            # Flat layout of a single PROJECT_BASE_DIR from before sharding
+            candidates.append(os.path.join(root, str(project_id)))
+        for path in candidates:
+            if os.path.isdir(path):
+                return path
+        return None
+
+    def project_dir(self, project_id: str) -> str:
+        """Directory of a project: where it currently is, or where a new one should be created"""
+        path = self.locate(project_id)
+        if path is None:
+            path = self.placement(project_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    @staticmethod
+    def entries_in(parent: str, project_id: str) -> List[str]:
+        """Names of the project directory and its backups in one directory"""
+        if not os.path.isdir(parent):
+            return []
+        return sorted(
+            name for name in os.listdir(parent)
+            if (name == str(project_id) or name.startswith(f"{project_id}{BACKUP_MARKER}")) and not name.endswith(TMP_SUFFIX)
+        )
+
+    def entries(self, project_id: str) -> List[str]:
+        """The project directory and its backups, wherever they are"""
+        return [
+            os.path.join(parent, name)
+            for root in self.roots
+            for parent in (self.shard_dir(root, project_id), root)
+            for name in self.entries_in(parent, project_id)
+        ]
+
+    def snapshot(self, project_dir: str) -> str:
+        """Copy a project directory to a new backup next to it and return the backup's path"""
+        backup_dir = f"{project_dir}{BACKUP_MARKER}{time.time_ns()}"
+        shutil.copytree(project_dir, backup_dir, symlinks=True)
+        return backup_dir
+
+    def remove(self, project_id: str):
+        """Delete a project's directory and all of its backups"""
+        for path in self.entries(project_id):
+            shutil.rmtree(path, ignore_errors=True)
+
+    def iter_projects(self) -> Iterator[Tuple[str, str]]:
+        """Yield (project_id, directory containing its entries) for every stored project"""
+        seen = set()
+        for root in self.roots:
+            if not os.path.isdir(root):
+                continue
+            for parent in self._project_parents(root):
+                for name in sorted(os.listdir(parent)):
+                    if name.endswith(TMP_SUFFIX) or not os.path.isdir(os.path.join(parent, name)):
+                        continue
+                    if parent == root and len(name) == FANOUT_WIDTH:
+                        continue  # A fan-out directory, not a project
+                    project_id = name.split(BACKUP_MARKER, 1)[0]
+                    if (project_id, parent) not in seen:
+                        seen.add((project_id, parent))
+                        yield project_id, parent
+
+    @staticmethod
+    def _project_parents(root: str) -> Iterator[str]:
+        # The root itself holds projects of the old flat layout next to the fan-out directories
+        yield root
+        level = [root]
+        for _ in range(FANOUT_LEVELS):
+            level = [
+                os.path.join(parent, name)
+                for parent in level
+                for name in sorted(os.listdir(parent))
+                if len(name) == FANOUT_WIDTH and os.path.isdir(os.path.join(parent, name))
+            ]
+        yield from level
+
+    def misplaced(self) -> List[Dict]:
+        """Projects whose directories are not where ``placement`` puts them"""
+        moves = []
+        for project_id, parent in self.iter_projects():
+            target = os.path.dirname(self.placement(project_id))
+            if os.path.abspath(parent) != target:
+                moves.append({"project_id": project_id, "source": parent, "target": target})
+        return moves
+
+    def move(self, project_id: str, source: str, target: str) -> Dict[str, str]:
+        """Copy a project's entries from one fan-out directory to another.
+
+        Every entry is copied next to its destination under a temporary name
+        and renamed into place, so an interrupted move never leaves a partial
+        directory where ``locate`` would find it. The sources are left for the
+        caller to delete once the stored paths point to the new location.
+        Returns the mapping of old to new paths.
+        """
+        os.makedirs(target, exist_ok=True)
+        moved = {}
+        for name in self.entries_in(source, project_id):
+            src, dst = os.path.join(source, name), os.path.join(target, name)
+            if not os.path.exists(dst):
+                tmp = dst + TMP_SUFFIX
+                shutil.rmtree(tmp, ignore_errors=True)
+                shutil.copytree(src, tmp, symlinks=True)
+                os.rename(tmp, dst)
+            moved[src] = dst
+        return moved
+
+
+def _roots(settings) -> List[str]:
+    roots = [root.strip() for root in settings.PROJECT_STORAGE_ROOTS.split(",") if root.strip()]
+    return roots or [settings.PROJECT_BASE_DIR]
+
+
+# Create a shared instance
+_settings = get_settings()
+project_storage = ProjectStorage(_roots(_settings), lock_dir=os.path.join(_settings.JOB_JOURNAL_DIR, "locks"))
@@ -0,0 +1,281 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span_id", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict):
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = self.start_ns
+        self.attributes = attributes
+        self.error = False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans recorded while handling one request"""
+
+    def __init__(self, name: str):
+        self.trace_id = _new_id(16)
+        self.spans: List[Span] = []
+        self.root = Span(name, None, {})
+
+    def server_timing(self) -> str:
+        """Aggregate spans by name into a Server-Timing header value"""
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            entry = totals.setdefault(span.name, [0.0, 0])
+            entry[0] += span.duration_ms
+            entry[1] += 1
+        metrics = [
+            f'{name};dur={duration:.1f};desc="x{count}"' if count > 1 else f"{name};dur={duration:.1f}"
+            for name, (duration, count) in totals.items()
+        ]
+        metrics.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(metrics)
+
+    def to_otlp(self) -> Dict:
+        """Serialize in the OTLP/JSON layout understood by OpenTelemetry collectors"""
+        def encode(span: Span) -> Dict:
+            encoded = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 2 if span is self.root else 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in span.attributes.items()
+                ],
+                "status": {"code": 2 if span.error else 1},
+            }
+            if span.parent_id:
+                encoded["parentSpanId"] = span.parent_id
+            return encoded
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "oneshotcodegen-api"}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.tracing"},
+                    "spans": [encode(self.root)] + [encode(span) for span in self.spans],
+                }],
+            }]
+        }
+
+
+class FileSpanExporter:
+    """Appends finished traces as OTLP/JSON lines from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.queue: queue.Queue = queue.Queue(maxsize=10000)
+        self.thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self.thread.start()
+
+    def export(self, trace: Trace):
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping trace", extra={"trace_id": trace.trace_id})
+
+    def _run(self):
+        while True:
+            trace = self.queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.to_otlp()) + "\n")
+            except OSError as e:
+                logger.error("Trace export failed", extra={"path": self.path, "error": str(e)})
+
+
+class Tracer:
+    """Samples requests at a rate shared by all worker processes.
+
+    A rate set at runtime is written to ``rate_path`` in JOB_JOURNAL_DIR,
+    which every worker re-reads at most once per ``refresh_interval``. The
+    file also records the configured TRACE_SAMPLE_RATE it overrides, so
+    changing the setting and restarting discards an older runtime change.
+    """
+
+    def __init__(self, refresh_interval: float = 1.0):
+        self.sample_rate = 1.0
+        self.configured_rate = 1.0
+        self.exporter: Optional[FileSpanExporter] = None
+        self.rate_path: Optional[str] = None
+        self.refresh_interval = refresh_interval
+        self._checked = float("-inf")
+        self._mtime_ns = 0
+
+    def configure(self, settings):
+        self.set_sample_rate(settings.TRACE_SAMPLE_RATE, share=False)
+        self.configured_rate = self.sample_rate
+        self.rate_path = os.path.join(settings.JOB_JOURNAL_DIR, "trace-sample-rate.json")
+        self._checked = float("-inf")
+        self._mtime_ns = 0
+        if settings.TRACE_EXPORT_PATH:
+            self.exporter = FileSpanExporter(settings.TRACE_EXPORT_PATH)
+
+    def set_sample_rate(self, rate: float, share: bool = True):
+        """Change the fraction of requests that are traced, in every worker within ``refresh_interval``"""
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("Sample rate must be between 0 and 1")
+        if share and self.rate_path:
+            os.makedirs(os.path.dirname(self.rate_path) or ".", exist_ok=True)
+            tmp_path = f"{self.rate_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sample_rate": rate, "configured_rate": self.configured_rate}, f)
+            os.replace(tmp_path, self.rate_path)
+        self.sample_rate = rate
+
+    def current_rate(self) -> float:
+        """The sample rate, picking up a change made by another worker"""
+        now = time.monotonic()
+        if self.rate_path and now - self._checked >= self.refresh_interval:
+            self._checked = now
+            self._reload()
+        return self.sample_rate
+
+    def _reload(self):
+        try:
+            mtime_ns = os.stat(self.rate_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns == self._mtime_ns:
+            return
+        self._mtime_ns = mtime_ns
+        try:
+            with open(self.rate_path, encoding="utf-8") as f:
+                shared = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read the shared trace sample rate", extra={"path": self.rate_path, "error": str(e)})
+            return
+        if shared.get("configured_rate") == self.configured_rate:
+            self.sample_rate = shared["sample_rate"]
+
+    def should_sample(self) -> bool:
+        rate = self.current_rate()
+        return rate >= 1.0 or random.random() < rate
+
+    def finish(self, trace: Trace):
+        trace.root.end_ns = time.time_ns()
+        if self.exporter:
+            self.exporter.export(trace)
+
+
+# Create a shared instance
+tracer = Tracer()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a span under the current request trace; a no-op when the request is not sampled"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = Span(name, _current_span_id.get() or trace.root.span_id, attributes)
+    start = time.perf_counter_ns()
+    token = _current_span_id.set(current.span_id)
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        _current_span_id.reset(token)
+        current.end_ns = current.start_ns + (time.perf_counter_ns() - start)
+        trace.spans.append(current)
+
+
+def record_span(name: str, duration_s: float, **attributes):
+    """Record a span that was timed elsewhere and has just ended"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    current = Span(name, _current_span_id.get() or trace.root.span_id, attributes)
+    current.end_ns = current.start_ns
+    current.start_ns -= int(duration_s * 1e9)
+    trace.spans.append(current)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording a span around every call of an async function"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_methods(prefix: str):
+    """Class decorator applying traced to every public async method as ``<prefix>.<method>``"""
+    def decorator(cls):
+        for name, member in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(member):
+                setattr(cls, name, traced(f"{prefix}.{name}")(member))
+        return cls
+    return decorator
+
+
+class TracingMiddleware:
+    """Starts a trace per sampled HTTP request and reports it in a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.should_sample():
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        trace.root.attributes.update({"http.method": scope["method"], "http.target": scope["path"]})
+        token = _current_trace.set(trace)
+        start = time.perf_counter_ns()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.root.end_ns = trace.root.start_ns + (time.perf_counter_ns() - start)
+                trace.root.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            tracer.finish(trace)
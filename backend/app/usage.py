@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict
+
+from app.config import get_settings
+from app.database import supabase
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("projects", "generations", "edits", "reverts", "build_minutes", "bytes_stored")
+
+
+class UsageTracker:
+    """Per-user usage counters maintained incrementally.
+
+    Jobs call ``record`` with deltas, which only touches an in-memory buffer.
+    The buffer is flushed to the ``usage_stats`` table in one batched
+    ``increment_usage`` call, so ``/settings/usage`` is a single primary key
+    lookup instead of a scan over projects, versions and chat messages.
+    ``reconcile_usage`` periodically recomputes what can be derived from the
+    other tables to correct any drift.
+    """
+
+    def __init__(self, flush_interval: float = 10.0, flush_batch_size: int = 500, reconcile_interval: float = 21600.0):
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.reconcile_interval = reconcile_interval
+        self.pending: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._flush_event = asyncio.Event()
+        self._tasks = []
+
+    def record(self, user_id: str, **deltas: float):
+        """Buffer counter deltas for a user, e.g. ``record(user_id, generations=1)``"""
+        counters = self.pending[str(user_id)]
+        for name, value in deltas.items():
+            if name not in COUNTERS:
+                raise ValueError(f"Unknown usage counter: {name}")
+            counters[name] += value
+        if len(self.pending) >= self.flush_batch_size:
+            self._flush_event.set()
+
+    async def flush(self):
+        """Write all buffered deltas in one call; deltas are kept for the next flush on failure"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, defaultdict(lambda: defaultdict(float))
+        rows = [
+            {"user_id": user_id, **{name: round(value, 4) if name == "build_minutes" else int(value) for name, value in counters.items()}}
+            for user_id, counters in batch.items()
+        ]
+        try:
+            await asyncio.to_thread(lambda: supabase.rpc("increment_usage", {"deltas": rows}).execute())
+            logger.debug("Usage flushed", extra={"users": len(rows)})
+        except Exception as e:
+            logger.error("Usage flush failed", extra={"users": len(rows), "error": str(e)})
+            for user_id, counters in batch.items():
+                for name, value in counters.items():
+                    self.pending[user_id][name] += value
+
+    async def reconcile(self):
+        try:
+            await asyncio.to_thread(lambda: supabase.rpc("reconcile_usage", {}).execute())
+            logger.info("Usage reconciled")
+        except Exception as e:
+            logger.error("Usage reconciliation failed", extra={"error": str(e)})
+
+    async def get_usage(self, user_id: str) -> Dict:
+        response = supabase.table('usage_stats').select("*").eq('user_id', str(user_id)).limit(1).execute()
+        row = response.data[0] if response.data else {}
+        usage = {name: row.get(name) or 0 for name in COUNTERS}
+        # Include this worker's deltas that have not been flushed yet
+        for name, value in self.pending.get(str(user_id), {}).items():
+            usage[name] += value
+        # The buffered deltas are floats, report the same types as a flushed row
+        usage = {name: round(float(value), 2) if name == "build_minutes" else int(value) for name, value in usage.items()}
+        usage["updated_at"] = row.get("updated_at")
+        usage["reconciled_at"] = row.get("reconciled_at")
+        return usage
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            await self.flush()
+            await self.reconcile()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+        if self.reconcile_interval > 0:
+            self._tasks.append(asyncio.create_task(self._reconcile_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+
+
+# Create a shared instance
+_settings = get_settings()
+usage_tracker = UsageTracker(
+    flush_interval=_settings.USAGE_FLUSH_INTERVAL,
+    flush_batch_size=_settings.USAGE_FLUSH_BATCH_SIZE,
+    reconcile_interval=_settings.USAGE_RECONCILE_INTERVAL,
+)
@@ -0,0 +1,111 @@
+import difflib
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+# Directories that are rebuilt from lockfiles or by the build and are not part of a version's source
+IGNORED_DIRS = {"node_modules", ".git", "__pycache__", ".next", "dist", "build", ".venv", "venv"}
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_DIFF_FILE_SIZE = 1024 * 1024
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(root: str) -> Dict:
+    """Walk a version directory once and record (path, size, hash) for every file.
+
+    Paths are relative to root and always use forward slashes so manifests
+    compare equal across platforms.
+    """
+    files: Dict[str, Dict] = {}
+    if root and os.path.isdir(root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                if not os.path.isfile(full_path):
+                    continue
+                rel_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+                files[rel_path] = {
+                    "size": os.path.getsize(full_path),
+                    "hash": _hash_file(full_path),
+                }
+    return {"root": root, "files": files}
+
+
+def diff_manifests(old: Dict, new: Dict) -> Dict[str, List[Dict]]:
+    """Compare two manifests by hash only, without reading any file contents."""
+    old_files = old.get("files", {})
+    new_files = new.get("files", {})
+    added, removed, modified = [], [], []
+
+    for path, entry in new_files.items():
+        previous = old_files.get(path)
+        if previous is None:
+            added.append({"path": path, "size": entry["size"]})
+        elif previous["hash"] != entry["hash"]:
+            modified.append({"path": path, "old_size": previous["size"], "new_size": entry["size"]})
+    for path, entry in old_files.items():
+        if path not in new_files:
+            removed.append({"path": path, "size": entry["size"]})
+
+    return {
+        "added": sorted(added, key=lambda f: f["path"]),
+        "removed": sorted(removed, key=lambda f: f["path"]),
+        "modified": sorted(modified, key=lambda f: f["path"]),
+    }
+
+
+def manifest_size(manifest: Dict) -> int:
+    """Total bytes of all files in a manifest"""
+    return sum(entry["size"] for entry in manifest.get("files", {}).values())
+
+
+def file_tree(manifest: Dict) -> List[Dict]:
+    """Flat, sorted listing of the files in a manifest"""
+    return [
+        {"path": path, "size": entry["size"], "hash": entry["hash"]}
+        for path, entry in sorted(manifest.get("files", {}).items())
+    ]
+
+
+def _read_lines(root: Optional[str], path: str, manifest: Dict) -> List[str]:
+    if path not in manifest.get("files", {}) or not root:
+        return []
+    full_path = os.path.normpath(os.path.join(root, path))
+    # Never follow a requested path outside of the version directory
+    if os.path.commonpath([os.path.abspath(root), os.path.abspath(full_path)]) != os.path.abspath(root):
+        raise ValueError("Invalid file path")
+    if os.path.getsize(full_path) > MAX_DIFF_FILE_SIZE:
+        raise ValueError("File is too large to diff")
+    with open(full_path, "rb") as f:
+        content = f.read()
+    # Versions recorded before they had their own snapshot point at a directory that may have changed since
+    if hashlib.sha256(content).hexdigest() != manifest["files"][path]["hash"]:
+        raise ValueError("File has changed since the version was recorded")
+    return content.decode("utf-8", errors="replace").splitlines(keepends=True)
+
+
+def unified_file_diff(old: Dict, new: Dict, path: str, old_label: str = "a", new_label: str = "b") -> str:
+    """Load a single file from both versions and return its unified diff."""
+    old_entry = old.get("files", {}).get(path)
+    new_entry = new.get("files", {}).get(path)
+    if old_entry is None and new_entry is None:
+        raise FileNotFoundError(path)
+    if old_entry is not None and new_entry is not None and old_entry["hash"] == new_entry["hash"]:
+        return ""
+
+    old_lines = _read_lines(old.get("root"), path, old)
+    new_lines = _read_lines(new.get("root"), path, new)
+    return "".join(difflib.unified_diff(
+        old_lines,
+        new_lines,
+        fromfile=f"{old_label}/{path}",
+        tofile=f"{new_label}/{path}",
+    ))
@@ -1,36 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
 from fastapi import WebSocket
-from typing import Dict
+from typing import Deque, Dict, Optional
+from app.config import get_settings
+from app.metrics import BROADCAST_SECONDS, WEBSOCKET_CONNECTIONS, WEBSOCKET_DROPPED_MESSAGES, observe_latency
+from app.tracing import traced_methods
 
+logger = logging.getLogger(__name__)
+
+class Connection:
+    """One WebSocket with its own bounded outbound queue and sender task.
+
+    Broadcasters only append to the queue, so a slow client never blocks
+    the coroutine that is broadcasting. The sender task also sends a ping
+    every ``heartbeat_interval``, whatever else is being sent, and closes the
+    socket when a ping gets no reply from the client within ``idle_timeout``.
+    """
+
+    def __init__(self, websocket: WebSocket, project_id: str, manager: "WebSocketManager"):
+        self.websocket = websocket
+        self.project_id = project_id
+        self.manager = manager
+        self.queue: Deque[dict] = deque()
+        self.ready = asyncio.Event()
+        self.last_seen = time.monotonic()
+        self.ping_sent: Optional[float] = None  # When the oldest unanswered ping was queued
+        self.closed = False
+        self.overflowed = False
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._sender())
+
+    def touch(self):
+        """Record activity from the client, which answers any outstanding ping"""
+        self.last_seen = time.monotonic()
+        self.ping_sent = None
+
+    def enqueue(self, message: dict):
+        if self.closed:
+            return
+        if len(self.queue) >= self.manager.queue_size and not self._make_room(message):
+            return
+        self.queue.append(message)
+        self.ready.set()
+
+    def _make_room(self, message: dict) -> bool:
+        """Handle a full queue; returns whether ``message`` should still be appended"""
+        if message.get("type") == "loading":
+            if self.queue[-1].get("type") == "loading":
+                # Consecutive progress updates: only the latest one matters
+                self.queue[-1] = message
+                WEBSOCKET_DROPPED_MESSAGES.labels(reason="coalesced").inc()
+            else:
+                WEBSOCKET_DROPPED_MESSAGES.labels(reason="dropped").inc()
+            return False
+        for i, queued in enumerate(self.queue):
+            if queued.get("type") == "loading":
+                del self.queue[i]
+                WEBSOCKET_DROPPED_MESSAGES.labels(reason="dropped").inc()
+                return True
+        # Nothing left to drop, the client is too slow to keep up; the sender task closes it
+        WEBSOCKET_DROPPED_MESSAGES.labels(reason="overflow").inc()
+        self.overflowed = True
+        self.ready.set()
+        return False
+
+    async def _sender(self):
+        manager = self.manager
+        next_ping = time.monotonic() + manager.heartbeat_interval
+        try:
+            while not self.closed:
+                if self.overflowed:
+                    await self.close(reason="send queue overflow")
+                    return
+                now = time.monotonic()
+                if now >= next_ping:
+                    if self.ping_sent is not None and now - self.ping_sent > manager.idle_timeout:
+                        await self.close(reason="heartbeat timeout")
+                        return
+                    if self.ping_sent is None:
+                        self.ping_sent = now
+                    # Ahead of queued progress updates, so a busy stream does not delay it
+                    self.queue.appendleft({"type": "ping"})
+                    next_ping = now + manager.heartbeat_interval
+                if not self.queue:
+                    self.ready.clear()
+                    try:
+                        await asyncio.wait_for(self.ready.wait(), timeout=max(next_ping - now, 0))
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                message = self.queue.popleft()
+                await asyncio.wait_for(self.websocket.send_json(message), timeout=manager.send_timeout)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Message sent", extra={"project_id": self.project_id, "payload": message})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Error sending message", extra={"project_id": self.project_id, "error": str(e)})
+            await self.close(reason="send failed")
+
+    async def close(self, reason: str, code: int = 1011):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        logger.info("Closing WebSocket", extra={"project_id": self.project_id, "reason": reason})
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=self.manager.send_timeout)
+        except Exception:
+            pass
+        self.manager._remove(self)
+
+@traced_methods("ws")
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}  # Map project_id to WebSocket
+    def __init__(self, queue_size: int = 100, heartbeat_interval: float = 20.0, idle_timeout: float = 60.0, send_timeout: float = 10.0):
+        self.active_connections: Dict[str, Connection] = {}  # Map project_id to Connection
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
 
-    async def connect(self, websocket: WebSocket, project_id: str):
+    async def connect(self, websocket: WebSocket, project_id: str) -> Connection:
         await websocket.accept()
-        self.active_connections[project_id] = websocket
-        print(f"WebSocket connected for project {project_id}")
-        print(f"Active connections: {self.active_connections.keys()}")
+        previous = self.active_connections.get(project_id)
+        connection = Connection(websocket, project_id, self)
+        self.active_connections[project_id] = connection
+        connection.start()
+        if previous:
+            await previous.close(reason="replaced by a new connection", code=1000)
+        WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
+        logger.info("WebSocket connected", extra={"project_id": project_id, "active_connections": len(self.active_connections)})
+        return connection
 
-    async def disconnect(self, project_id: str):
-        if project_id in self.active_connections:
-            del self.active_connections[project_id]
-            print(f"WebSocket disconnected for project {project_id}")
+    async def disconnect(self, project_id: str, connection: Optional[Connection] = None):
+        current = self.active_connections.get(project_id)
+        if current is None or (connection is not None and current is not connection):
+            return
+        await current.close(reason="client disconnected", code=1000)
 
-    async def broadcast_to_project(self, project_id: str, message: dict):
-        print(f"Broadcasting to project {project_id}")
-        print(f"Active connections: {self.active_connections}")
-        print(f"Active connections keys: {self.active_connections.keys()}")
-        if project_id in self.active_connections:
+    def _remove(self, connection: Connection):
+        if self.active_connections.get(connection.project_id) is connection:
+            del self.active_connections[connection.project_id]
+            WEBSOCKET_CONNECTIONS.set(len(self.active_connections))
+            logger.info("WebSocket disconnected", extra={"project_id": connection.project_id, "active_connections": len(self.active_connections)})
+
+    def handle_message(self, connection: Connection, data: str):
+        """Handle a message from the client; every message counts as a sign of life"""
+        connection.touch()
+        if data == "ping":
+            connection.enqueue({"type": "pong"})
+        elif data.startswith("{"):
             try:
-                websocket = self.active_connections[project_id]
-                await websocket.send_json(message)
-                print(f"Message sent to project {project_id}: {message}")
-            except Exception as e:
-                print(f"Error sending message to project {project_id}: {str(e)}")
-                await self.disconnect(project_id)
+                message = json.loads(data)
+            except ValueError:
+                return
+            if isinstance(message, dict) and message.get("type") == "ping":
+                connection.enqueue({"type": "pong"})
+
+    @observe_latency(BROADCAST_SECONDS)
+    async def broadcast_to_project(self, project_id: str, message: dict):
+        connection = self.active_connections.get(project_id)
+        if connection:
+            connection.enqueue(message)
         else:
-            print(f"No active WebSocket connection for project {project_id}")
+            logger.debug("No active WebSocket connection", extra={"project_id": project_id})
 
 
 # Create a shared instance
-websocket_manager = WebSocketManager()
+_settings = get_settings()
+websocket_manager = WebSocketManager(
+    queue_size=_settings.WS_QUEUE_SIZE,
+    heartbeat_interval=_settings.WS_HEARTBEAT_INTERVAL,
+    idle_timeout=_settings.WS_IDLE_TIMEOUT,
+    send_timeout=_settings.WS_SEND_TIMEOUT,
+)
@@ -0,0 +1,99 @@
+"""Stand-in for the oneShotCodeGen ``cli`` module used by the benchmarks.
+
+Behaviour is controlled through environment variables so that it can be
+tuned per scenario without touching the app:
+
+- ``BENCH_CLI_SECONDS``: simulated generation time per call
+- ``BENCH_CLI_STATUS_MESSAGES``: number of progress messages sent through the broadcast callback
+- ``BENCH_CLI_FILES`` / ``BENCH_CLI_FILE_BYTES``: output volume written to the project directory
+"""
+import asyncio
+import os
+import shutil
+import time
+from typing import Callable, Dict, Optional
+
+
+def _config():
+    return (
+        float(os.getenv("BENCH_CLI_SECONDS", "0.5")),
+        int(os.getenv("BENCH_CLI_STATUS_MESSAGES", "5")),
+        int(os.getenv("BENCH_CLI_FILES", "20")),
+        int(os.getenv("BENCH_CLI_FILE_BYTES", "2048")),
+    )
+
+
+def _write_files(output_dir: str, files: int, file_bytes: int, salt: str):
+    for i in range(files):
+        path = os.path.join(output_dir, "src", f"module_{i}.tsx")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        line = f"// {salt} module {i}\n"
+        with open(path, "w") as f:
+            f.write((line * (file_bytes // len(line) + 1))[:file_bytes])
+
+
+async def _simulate(broadcast_callback: Optional[Callable], steps: list):
+    seconds, messages, _, _ = _config()
+    for i in range(messages):
+        if broadcast_callback:
+            await broadcast_callback(steps[i] if i < len(steps) else f"Progress {i + 1}/{messages}")
+        await asyncio.sleep(seconds / max(messages, 1))
+
+
+def _use_cases():
+    return {"use_cases": [{"name": "Track Sales", "description": "Track sales data in real time"}]}
+
+
+async def createAPI(
+    description: str,
+    output_dir: str,
+    broadcast_callback: Optional[Callable] = None,
+    use_docker: bool = True,
+    use_nginx: bool = False
+) -> Dict:
+    _, _, files, file_bytes = _config()
+    await _simulate(broadcast_callback, ["Starting app generation...", "Generating code...", "Building Docker container..."])
+    await asyncio.to_thread(_write_files, output_dir, files, file_bytes, "v1")
+    return {
+        "status": "success",
+        "message": "App created successfully",
+        "output_dir": output_dir,
+        "preview_url": "http://localhost:3006",
+        "use_cases": _use_cases()
+    }
+
+
+async def editAPI(
+    project_dir: str,
+    description: str,
+    broadcast_callback: Optional[Callable] = None,
+    use_docker: bool = True,
+    use_nginx: bool = False
+) -> Dict:
+    _, _, files, file_bytes = _config()
+    await _simulate(broadcast_callback, ["Starting app modification...", "Applying changes...", "Rebuilding Docker container..."])
+    await asyncio.to_thread(_write_files, project_dir, max(files // 4, 1), file_bytes, str(time.time()))
+    backup_dir = f"{project_dir}_backup_{time.time_ns()}"
+    await asyncio.to_thread(shutil.copytree, project_dir, backup_dir)
+    return {
+        "status": "success",
+        "message": "App modified successfully",
+        "backup_dir": backup_dir,
+        "preview_url": "http://localhost:3006",
+        "use_cases": _use_cases()
+    }
+
+
+async def revertAPI(
+    project_dir: str,
+    backup_dir: str,
+    broadcast_callback: Optional[Callable] = None,
+    use_docker: bool = True,
+    use_nginx: bool = False
+) -> Dict:
+    await _simulate(broadcast_callback, ["Starting reversion process...", "Restoring from backup...", "Rebuilding Docker container..."])
+    return {
+        "status": "success",
+        "message": "App reverted successfully",
+        "preview_url": "http://localhost:3006"
+    }
@@ -0,0 +1,243 @@
+"""In-process stand-in for the Supabase REST (PostgREST) and auth APIs.
+
+Only implements the subset of PostgREST used by the app: ``select``,
+``eq``/``neq``/``in``/``is``/``ilike`` filters, ``order``, ``limit``/``offset``,
+single-object responses, insert, upsert, update, delete and the RPC
+functions registered in ``FakeSupabase.functions``. Every request
+sleeps for a configurable latency so that benchmarks can model a remote
+database.
+"""
+import asyncio
+import json
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Fake service key, create_client only checks that it looks like a JWT
+FAKE_SUPABASE_KEY = "fake.benchmark.key"
+
+# Column defaults applied on insert, mirroring databasedetails.md
+TABLE_DEFAULTS = {
+    "projects": {
+        "status": "Created",
+        "current_version_id": None,
+        "current_project_dir": None,
+        "current_project_preview_url": None,
+    },
+    "versions": {"backup_dir": "", "status": "notGenerated", "manifest": None},
+    "chat_messages": {"type": "normal"},
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def user_id_for_token(token: str) -> str:
+    """Every bearer token is a valid user; the same token always maps to the same user"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, token))
+
+
+def _parse_filter(expression: str) -> Callable[[object], bool]:
+    operator, _, value = expression.partition(".")
+    if operator == "eq":
+        return lambda v: v is not None and str(v) == value
+    if operator == "neq":
+        return lambda v: v is None or str(v) != value
+    if operator == "in":
+        values = {item.strip().strip('"') for item in value.strip("()").split(",")}
+        return lambda v: v is not None and str(v) in values
+    if operator == "is":
+        return lambda v: v is None if value == "null" else str(v).lower() == value
+    if operator == "ilike":
+        needle = value.replace("*", "").replace("%", "").lower()
+        return lambda v: v is not None and needle in str(v).lower()
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+class FakeSupabase:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tables: Dict[str, List[Dict]] = {}
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.app = Starlette(routes=[
+            Route("/auth/v1/user", self.get_user, methods=["GET"]),
+            Route("/rest/v1/rpc/{function}", self.rpc, methods=["POST"]),
+            Route("/rest/v1/{table}", self.table, methods=["GET", "POST", "PATCH", "DELETE"]),
+        ])
+        self.functions: Dict[str, Callable[[Dict], object]] = {
+            "increment_usage": self._increment_usage,
+            "reconcile_usage": lambda params: None,
+            "search_user_content": self._search_user_content,
+        }
+
+    async def _delay(self):
+        self.request_count += 1
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def insert_rows(self, table: str, rows: List[Dict]) -> List[Dict]:
+        """Insert rows directly, used by scenarios to seed data"""
+        created = []
+        with self.lock:
+            for row in rows:
+                record = {"id": str(uuid.uuid4()), "created_at": _now(), "updated_at": _now()}
+                record.update(TABLE_DEFAULTS.get(table, {}))
+                record.update(row)
+                self.tables.setdefault(table, []).append(record)
+                created.append(record)
+        return created
+
+    async def get_user(self, request: Request) -> Response:
+        await self._delay()
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not token:
+            return JSONResponse({"msg": "missing token"}, status_code=401)
+        return JSONResponse({
+            "id": user_id_for_token(token),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": f"{token}@bench.local",
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": _now(),
+        })
+
+    def _increment_usage(self, params: Dict):
+        with self.lock:
+            stats = {row["user_id"]: row for row in self.tables.setdefault("usage_stats", [])}
+            for delta in params["deltas"]:
+                row = stats.get(delta["user_id"])
+                if row is None:
+                    row = {"user_id": delta["user_id"], "projects": 0, "generations": 0, "edits": 0, "reverts": 0, "build_minutes": 0, "bytes_stored": 0}
+                    self.tables["usage_stats"].append(row)
+                for name, value in delta.items():
+                    if name != "user_id":
+                        row[name] += value
+                row["updated_at"] = _now()
+
+    def _search_user_content(self, params: Dict) -> List[Dict]:
+        """Substring stand-in for the tsvector search: every term must appear, rank is the number of hits"""
+        terms = [term for term in params["p_query"].lower().split() if term]
+        with self.lock:
+            projects = {row["id"]: row for row in self.tables.get("projects", []) if row.get("user_id") == params["p_user_id"]}
+            versions = {row["id"]: row for row in self.tables.get("versions", []) if row.get("project_id") in projects}
+            candidates = [
+                ("project", row, row["id"], None, row["name"], f"{row['name']} {row.get('description') or ''}")
+                for row in projects.values()
+            ] + [
+                ("use_case", row, versions[row["version_id"]]["project_id"], row["version_id"], row["title"], f"{row['title']} {row['description']}")
+                for row in self.tables.get("use_cases", []) if row.get("version_id") in versions
+            ] + [
+                # Structured messages, e.g. the result of an edit, are stored in the text column as their string form
+                ("chat_message", row, row["project_id"], None, row["sender"], str(row["message"]))
+                for row in self.tables.get("chat_messages", []) if row.get("project_id") in projects
+            ]
+        matches = []
+        for kind, row, project_id, version_id, title, text in candidates:
+            text = text.lower()
+            if terms and all(term in text for term in terms):
+                matches.append({
+                    "kind": kind,
+                    "id": row["id"],
+                    "project_id": project_id,
+                    "project_name": projects[project_id]["name"],
+                    "version_id": version_id,
+                    "title": title,
+                    "snippet": text[:200],
+                    "rank": float(sum(text.count(term) for term in terms)),
+                    "created_at": row["created_at"],
+                })
+        matches.sort(key=lambda match: (-match["rank"], match["created_at"]))
+        page = matches[params.get("p_offset", 0):params.get("p_offset", 0) + params.get("p_limit", 20)]
+        return [{**match, "total": len(matches)} for match in page]
+
+    async def rpc(self, request: Request) -> Response:
+        await self._delay()
+        function = self.functions.get(request.path_params["function"])
+        if function is None:
+            return JSONResponse({"code": "PGRST202", "message": "Could not find the function"}, status_code=404)
+        body = await request.body()
+        return JSONResponse(function(json.loads(body) if body else {}))
+
+    def _matching(self, table: str, request: Request) -> List[Dict]:
+        filters = [
+            (column, _parse_filter(expression))
+            for column, expression in request.query_params.multi_items()
+            if column not in ("select", "order", "limit", "offset", "on_conflict", "columns")
+        ]
+        return [row for row in self.tables.get(table, []) if all(check(row.get(column)) for column, check in filters)]
+
+    def _respond(self, request: Request, rows: List[Dict], status_code: int = 200) -> Response:
+        select = request.query_params.get("select", "*")
+        if select != "*":
+            columns = [column.strip() for column in select.split(",")]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse(
+                    {"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned", "details": f"The result contains {len(rows)} rows", "hint": None},
+                    status_code=406,
+                )
+            return JSONResponse(rows[0], status_code=status_code)
+        return JSONResponse(rows, status_code=status_code)
+
+    async def table(self, request: Request) -> Response:
+        await self._delay()
+        table = request.path_params["table"]
+
+        if request.method == "GET":
+            rows = self._matching(table, request)
+            order = request.query_params.get("order")
+            if order:
+                for part in reversed(order.split(",")):
+                    column, *modifiers = part.split(".")
+                    rows = sorted(rows, key=lambda row: str(row.get(column) or ""), reverse="desc" in modifiers)
+            offset = int(request.query_params.get("offset", 0))
+            limit = request.query_params.get("limit")
+            rows = rows[offset:offset + int(limit)] if limit else rows[offset:]
+            return self._respond(request, rows)
+
+        if request.method == "POST":
+            body = json.loads(await request.body())
+            rows = body if isinstance(body, list) else [body]
+            if "merge-duplicates" in request.headers.get("prefer", ""):
+                key = request.query_params.get("on_conflict", "id")
+                updated, new_rows = [], []
+                with self.lock:
+                    existing = {str(row.get(key)): row for row in self.tables.get(table, [])}
+                    for row in rows:
+                        match = existing.get(str(row.get(key)))
+                        if match is None:
+                            new_rows.append(row)
+                            continue
+                        match.update(row)
+                        match["updated_at"] = _now()
+                        updated.append(match)
+                return self._respond(request, updated + self.insert_rows(table, new_rows), 201)
+            return self._respond(request, self.insert_rows(table, rows), 201)
+
+        if request.method == "PATCH":
+            changes = json.loads(await request.body())
+            with self.lock:
+                rows = self._matching(table, request)
+                for row in rows:
+                    row.update(changes)
+                    row["updated_at"] = _now()
+            return self._respond(request, rows)
+
+        with self.lock:
+            rows = self._matching(table, request)
+            ids = {id(row) for row in rows}
+            self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in ids]
+        return self._respond(request, rows)
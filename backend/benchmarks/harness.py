@@ -0,0 +1,138 @@
+import asyncio
+import os
+import resource
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+class ServerThread:
+    """Runs an ASGI app with uvicorn on its own event loop in a background thread.
+
+    The app under test uses the synchronous Supabase client, so the fake
+    Supabase server must not share an event loop with it.
+    """
+
+    def __init__(self, app, port: Optional[int] = None, **config):
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="warning", **config
+        ))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.05)
+        return self
+
+    def call(self, coro):
+        """Run a coroutine on the server's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects per-operation latencies and errors for one scenario"""
+
+    def __init__(self, name: str, config: Dict):
+        self.name = name
+        self.config = config
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.error_samples: List[str] = []
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.rss_before = 0.0
+        self.extra: Dict = {}
+
+    def __enter__(self):
+        self.rss_before = rss_mb()
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.finished_at = time.perf_counter()
+
+    def record(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def error(self, message: str):
+        self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(message)
+
+    def result(self) -> Dict:
+        duration = self.finished_at - self.started_at
+        latencies = sorted(self.latencies)
+        return {
+            "scenario": self.name,
+            "config": self.config,
+            "operations": len(latencies),
+            "errors": self.errors,
+            "error_samples": self.error_samples,
+            "duration_s": round(duration, 3),
+            "throughput_ops": round(len(latencies) / duration, 2) if duration else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50) * 1000, 2),
+                "p95": round(percentile(latencies, 95) * 1000, 2),
+                "p99": round(percentile(latencies, 99) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+            "memory_mb": {
+                "rss_before": round(self.rss_before, 1),
+                "rss_after": round(rss_mb(), 1),
+                "peak_rss": round(peak_rss_mb(), 1),
+            },
+            **self.extra,
+        }
@@ -0,0 +1,136 @@
+"""Benchmark runner for the backend.
+
+Starts a fake Supabase server and the real app (with the fake ``cli``
+module) in-process, runs the selected scenarios and writes the results as
+JSON. Run from the backend directory:
+
+    python -m benchmarks.run --scenarios crud,messages --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.fake_supabase import FAKE_SUPABASE_KEY, FakeSupabase
+from benchmarks.harness import ServerThread
+
+SCENARIOS = ("crud", "messages", "generate", "websocket")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated list of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients for crud and messages")
+    parser.add_argument("--iterations", type=int, default=200, help="Operations per crud/messages scenario")
+    parser.add_argument("--users", type=int, default=10, help="Distinct users the clients are spread over")
+    parser.add_argument("--messages", type=int, default=200, help="Chat messages per project for the messages scenario")
+    parser.add_argument("--burst", type=int, default=20, help="Concurrent generations for the generate scenario")
+    parser.add_argument("--listeners", type=int, default=2000, help="WebSocket listeners for the websocket scenario")
+    parser.add_argument("--rounds", type=int, default=5, help="Broadcast rounds for the websocket scenario")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Latency added to every fake Supabase request")
+    parser.add_argument("--db-jitter-ms", type=float, default=1.0)
+    parser.add_argument("--cli-seconds", type=float, default=0.5, help="Simulated generation time")
+    parser.add_argument("--cli-status-messages", type=int, default=5)
+    parser.add_argument("--cli-files", type=int, default=20, help="Files written per generation")
+    parser.add_argument("--cli-file-bytes", type=int, default=2048)
+    parser.add_argument("--output", help="Write results to this JSON file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def raise_fd_limit():
+    """Thousands of WebSocket listeners need as many file descriptors on both ends"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    raise_fd_limit()
+
+    fake = FakeSupabase(latency_ms=args.db_latency_ms, jitter_ms=args.db_jitter_ms)
+    fake_server = ServerThread(fake.app).start()
+
+    # Configure the app before it is imported: settings, the fake cli module and quiet logs
+    project_dir = tempfile.mkdtemp(prefix="bench-projects-")
+    os.environ.update({
+        "SUPABASE_URL": fake_server.url,
+        "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+        "PROJECT_BASE_DIR": project_dir,
+        "JOB_JOURNAL_DIR": os.path.join(project_dir, ".journal"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "BENCH_CLI_SECONDS": str(args.cli_seconds),
+        "BENCH_CLI_STATUS_MESSAGES": str(args.cli_status_messages),
+        "BENCH_CLI_FILES": str(args.cli_files),
+        "BENCH_CLI_FILE_BYTES": str(args.cli_file_bytes),
+    })
+    sys.path.insert(0, str(Path(__file__).parent / "fake_cli"))
+
+    from app.main import app
+    from benchmarks import scenarios
+
+    app_server = ServerThread(app, backlog=4096).start()
+    ctx = scenarios.BenchContext(app_server, fake, args.users)
+
+    async def run_all():
+        results = []
+        for name in selected:
+            if name == "crud":
+                results.append(await scenarios.project_crud(ctx, args.concurrency, args.iterations))
+            elif name == "messages":
+                results.append(await scenarios.message_polling(ctx, args.concurrency, args.iterations, args.messages))
+            elif name == "generate":
+                results.append(await scenarios.generation_burst(ctx, args.burst))
+            elif name == "websocket":
+                results.append(await scenarios.websocket_fanout(ctx, args.listeners, args.rounds))
+            print(f"{name}: done", file=sys.stderr)
+        return results
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        app_server.stop()
+        fake_server.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "db_latency_ms": args.db_latency_ms,
+            "db_jitter_ms": args.db_jitter_ms,
+            "cli_seconds": args.cli_seconds,
+            "cli_status_messages": args.cli_status_messages,
+            "cli_files": args.cli_files,
+            "cli_file_bytes": args.cli_file_bytes,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import websockets
+
+from benchmarks.fake_supabase import FakeSupabase, user_id_for_token
+from benchmarks.harness import Recorder, ServerThread
+
+
+class BenchContext:
+    def __init__(self, app_server: ServerThread, fake: FakeSupabase, users: int):
+        self.app_server = app_server
+        self.fake = fake
+        self.tokens = [f"bench-user-{i}" for i in range(users)]
+
+    def client(self, token: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=f"{self.app_server.url}/api",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=httpx.Timeout(300.0),
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=1000),
+        )
+
+    def seed_project(self, token: str, messages: int = 0) -> Dict:
+        user_id = user_id_for_token(token)
+        project = self.fake.insert_rows("projects", [{"user_id": user_id, "name": "Bench project", "description": "Seeded"}])[0]
+        version = self.fake.insert_rows("versions", [{"project_id": project["id"], "version_number": 1}])[0]
+        project["current_version_id"] = version["id"]
+        if messages:
+            self.fake.insert_rows("chat_messages", [
+                {"project_id": project["id"], "user_id": user_id, "sender": "User", "message": f"Message {i}"}
+                for i in range(messages)
+            ])
+        return project
+
+
+async def timed(recorder: Recorder, request: Awaitable[httpx.Response]) -> httpx.Response:
+    start = time.perf_counter()
+    try:
+        response = await request
+    except Exception as e:
+        recorder.error(repr(e))
+        raise
+    recorder.record(time.perf_counter() - start)
+    if response.status_code >= 400:
+        recorder.error(f"{response.status_code}: {response.text[:200]}")
+    return response
+
+
+async def run_workers(concurrency: int, iterations: int, work: Callable[[int, int], Awaitable[None]]):
+    """Run ``iterations`` calls of ``work(worker, iteration)`` spread over ``concurrency`` workers"""
+    counter = iter(range(iterations))
+
+    async def worker(index: int):
+        for iteration in counter:
+            try:
+                await work(index, iteration)
+            except Exception:
+                pass
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+async def project_crud(ctx: BenchContext, concurrency: int, iterations: int) -> Dict:
+    """Create, list, fetch and delete projects"""
+    recorder = Recorder("project_crud", {"concurrency": concurrency, "iterations": iterations})
+    clients = [ctx.client(ctx.tokens[i % len(ctx.tokens)]) for i in range(concurrency)]
+
+    async def work(worker: int, iteration: int):
+        client = clients[worker]
+        created = await timed(recorder, client.post("/projects/", json={"name": f"Project {iteration}", "description": "Benchmark"}))
+        project_id = created.json()["id"]
+        await timed(recorder, client.get("/projects/"))
+        await timed(recorder, client.get(f"/projects/{project_id}"))
+        await timed(recorder, client.delete(f"/projects/{project_id}"))
+
+    with recorder:
+        await run_workers(concurrency, iterations, work)
+    for client in clients:
+        await client.aclose()
+    return recorder.result()
+
+
+async def message_polling(ctx: BenchContext, concurrency: int, iterations: int, messages: int) -> Dict:
+    """Poll the chat history of a project the way the chat page does"""
+    recorder = Recorder("message_polling", {"concurrency": concurrency, "iterations": iterations, "messages_per_project": messages})
+    clients, projects = [], []
+    for i in range(concurrency):
+        token = ctx.tokens[i % len(ctx.tokens)]
+        clients.append(ctx.client(token))
+        projects.append(ctx.seed_project(token, messages))
+
+    async def work(worker: int, iteration: int):
+        await timed(recorder, clients[worker].get(f"/projects/{projects[worker]['id']}/messages"))
+
+    with recorder:
+        await run_workers(concurrency, iterations, work)
+    for client in clients:
+        await client.aclose()
+    return recorder.result()
+
+
+async def generation_burst(ctx: BenchContext, burst: int) -> Dict:
+    """Start many generations at once and wait for all of them to finish"""
+    recorder = Recorder("generation_burst", {"burst": burst})
+    clients, projects = [], []
+    for i in range(burst):
+        token = ctx.tokens[i % len(ctx.tokens)]
+        clients.append(ctx.client(token))
+        projects.append(ctx.seed_project(token))
+
+    async def generate(i: int):
+        payload = {"project_id": projects[i]["id"], "sender": "User", "message": "Build a CRM for a small sales team"}
+        try:
+            await timed(recorder, clients[i].post(f"/projects/{projects[i]['id']}/generate", json=payload))
+        except Exception:
+            pass
+
+    requests_before = ctx.fake.request_count
+    with recorder:
+        await asyncio.gather(*(generate(i) for i in range(burst)))
+    for client in clients:
+        await client.aclose()
+    recorder.extra["supabase_requests"] = ctx.fake.request_count - requests_before
+    return recorder.result()
+
+
+async def websocket_fanout(ctx: BenchContext, listeners: int, rounds: int) -> Dict:
+    """Hold many WebSocket listeners open and measure broadcast delivery latency"""
+    from app.websocket import websocket_manager
+
+    recorder = Recorder("websocket_fanout", {"listeners": listeners, "rounds": rounds})
+    ws_url = ctx.app_server.url.replace("http://", "ws://")
+    project_ids: List[str] = [str(uuid.uuid4()) for _ in range(listeners)]
+    connect_latencies: List[float] = []
+    sockets = []
+
+    async def connect(project_id: str):
+        start = time.perf_counter()
+        try:
+            sockets.append(await websockets.connect(
+                f"{ws_url}/ws?token={ctx.tokens[0]}&project_id={project_id}",
+                open_timeout=120,
+                ping_interval=None,
+            ))
+            connect_latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            recorder.error(f"connect: {e!r}")
+
+    # Connect in batches so the listen backlog is not exceeded
+    for i in range(0, listeners, 200):
+        await asyncio.gather(*(connect(project_id) for project_id in project_ids[i:i + 200]))
+
+    async def fan_out(sent_at_holder: Dict):
+        sent_at_holder["start"] = time.perf_counter()
+        for project_id in project_ids:
+            await websocket_manager.broadcast_to_project(project_id, {"type": "loading", "message": "Generating code...", "project_id": project_id, "sender": "System"})
+        sent_at_holder["end"] = time.perf_counter()
+
+    async def receive(socket) -> float:
+        await socket.recv()
+        return time.perf_counter()
+
+    broadcast_durations = []
+    with recorder:
+        for _ in range(rounds if sockets else 0):
+            holder: Dict = {}
+            receivers = [asyncio.create_task(receive(socket)) for socket in sockets]
+            await asyncio.to_thread(ctx.app_server.call, fan_out(holder))
+            done, pending = await asyncio.wait(receivers, timeout=60)
+            for task in pending:
+                task.cancel()
+                recorder.error("message not delivered within 60s")
+            for task in done:
+                if task.exception():
+                    recorder.error(repr(task.exception()))
+                else:
+                    recorder.record(task.result() - holder["start"])
+            broadcast_durations.append(holder["end"] - holder["start"])
+
+    for socket in sockets:
+        await socket.close()
+    connect_latencies.sort()
+    recorder.extra["connected"] = len(connect_latencies)
+    recorder.extra["connect_p50_ms"] = round(connect_latencies[len(connect_latencies) // 2] * 1000, 2) if connect_latencies else 0.0
+    recorder.extra["broadcast_loop_ms"] = round(max(broadcast_durations) * 1000, 2) if broadcast_durations else 0.0
+    return recorder.result()
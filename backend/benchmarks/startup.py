@@ -0,0 +1,116 @@
+"""Measure worker cold start time and resident memory.
+
+Each measurement runs in a fresh interpreter that imports ``app.main`` and
+runs the app's startup, the same work a uvicorn worker does before serving
+its first request. Run from the backend directory:
+
+    python -m benchmarks.startup                 # against the real generator
+    python -m benchmarks.startup --fake-cli      # without oneShotCodeGen checked out
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.fake_supabase import FAKE_SUPABASE_KEY, FakeSupabase
+from benchmarks.harness import ServerThread
+
+WORKER_SCRIPT = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from app.main import app, lifespan
+imported = time.perf_counter()
+
+async def startup():
+    async with lifespan(app):
+        pass
+
+asyncio.run(startup())
+ready = time.perf_counter()
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+print(json.dumps({
+    "import_s": round(imported - start, 3),
+    "startup_s": round(ready - start, 3),
+    "rss_mb": round(rss_mb(), 1),
+    "generator_loaded": "cli" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def measure(preload: bool, fake_cli: bool, runs: int, supabase_url: str, work_dir: str):
+    # Startup replays job journals and writes to the database, so never point it at real ones
+    env = {
+        **os.environ,
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+        "PROJECT_BASE_DIR": os.path.join(work_dir, "projects"),
+        "PROJECT_STORAGE_ROOTS": "",
+        "JOB_JOURNAL_DIR": os.path.join(work_dir, "journal"),
+        "PRELOAD_GENERATOR": "true" if preload else "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    if fake_cli:
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).parent / "fake_cli"), env.get("PYTHONPATH")]))
+
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", WORKER_SCRIPT],
+            env=env,
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent.parent,
+        )
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    def median(key):
+        values = sorted(sample[key] for sample in samples)
+        return values[len(values) // 2]
+
+    return {
+        "import_s": median("import_s"),
+        "startup_s": median("startup_s"),
+        "rss_mb": median("rss_mb"),
+        "generator_loaded": samples[0]["generator_loaded"],
+        "modules": samples[0]["modules"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per mode, the median is reported")
+    parser.add_argument("--fake-cli", action="store_true", help="Use benchmarks/fake_cli instead of the real generator")
+    parser.add_argument("--output", help="Write results to this JSON file instead of stdout")
+    args = parser.parse_args(argv)
+
+    fake_server = ServerThread(FakeSupabase().app).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-startup-") as work_dir:
+            report = {
+                "fake_cli": args.fake_cli,
+                "api_only": measure(False, args.fake_cli, args.runs, fake_server.url, work_dir),
+                "preload_generator": measure(True, args.fake_cli, args.runs, fake_server.url, work_dir),
+            }
+    finally:
+        fake_server.stop()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
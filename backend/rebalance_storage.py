@@ -0,0 +1,120 @@
+"""Move project directories to the storage root they hash to.
+
+Run after adding a root to PROJECT_STORAGE_ROOTS (from the backend directory):
+
+    python rebalance_storage.py --dry-run
+    python rebalance_storage.py
+
+Each project is locked while it is moved, so no job can start on it, and
+projects with a job in flight or an interrupted job awaiting recovery are
+skipped and picked up by the next run. A project is copied to its new
+location, the directories stored in the database are rewritten, and only
+then is the old copy deleted, so the tool can be interrupted and run again.
+"""
+import argparse
+import glob
+import os
+import shutil
+from typing import Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.config import get_settings
+from app.database import supabase
+from app.jobs import TERMINAL_PHASES, read_journal
+from app.storage import ProjectStorage, project_storage
+
+
+def busy_projects(journal_dir: str) -> set:
+    """Projects with a job that has not reached a terminal phase in any worker's journal"""
+    busy = set()
+    for path in glob.glob(os.path.join(journal_dir, "jobs-*.jsonl")):
+        for job in read_journal(path).values():
+            if job.get("phase") not in TERMINAL_PHASES:
+                busy.add(job.get("project_id"))
+    return busy
+
+
+def _rewrite(path, moved: dict):
+    """New location of a stored path, or None if it was not moved"""
+    if not path:
+        return None
+    return moved.get(os.path.abspath(path))
+
+
+def update_database(project_id: str, moved: dict):
+    project = supabase.table("projects").select("id, current_project_dir").eq("id", project_id).execute().data
+    if project:
+        new_dir = _rewrite(project[0]["current_project_dir"], moved)
+        if new_dir:
+            supabase.table("projects").update({"current_project_dir": new_dir}).eq("id", project_id).execute()
+
+    versions = supabase.table("versions").select("id, backup_dir, manifest").eq("project_id", project_id).execute().data
+    for version in versions:
+        changes = {}
+        new_backup = _rewrite(version["backup_dir"], moved)
+        if new_backup:
+            changes["backup_dir"] = new_backup
+        manifest = version.get("manifest")
+        new_root = _rewrite(manifest.get("root"), moved) if manifest else None
+        if new_root:
+            changes["manifest"] = {**manifest, "root": new_root}
+        if changes:
+            supabase.table("versions").update(changes).eq("id", version["id"]).execute()
+
+
+def rebalance(storage: ProjectStorage, journal_dir: str, dry_run: bool = False) -> Dict[str, int]:
+    moves = storage.misplaced()
+    print(f"{len(moves)} project(s) to move across {len(storage.roots)} root(s)")
+
+    stats = {"misplaced": len(moves), "moved": 0, "skipped": 0, "failed": 0}
+    for move in moves:
+        project_id = move["project_id"]
+        print(f"{project_id}: {move['source']} -> {move['target']}")
+        if dry_run:
+            continue
+        # Held exclusively for the whole move, jobs cannot start on the project meanwhile
+        lock = storage.lock(project_id, exclusive=True)
+        if lock is None:
+            print(f"{project_id}: skipped, a job is in flight")
+            stats["skipped"] += 1
+            continue
+        try:
+            # Interrupted jobs of dead workers still need to be rolled back in place
+            if project_id in busy_projects(journal_dir):
+                print(f"{project_id}: skipped, an interrupted job is waiting for recovery")
+                stats["skipped"] += 1
+                continue
+            existing = set(storage.entries_in(move["target"], project_id))
+            try:
+                moved = storage.move(project_id, move["source"], move["target"])
+                update_database(project_id, moved)
+            except Exception as e:
+                # Drop the new copies, otherwise they would be found before the sources the database points to
+                for name in set(storage.entries_in(move["target"], project_id)) - existing:
+                    shutil.rmtree(os.path.join(move["target"], name), ignore_errors=True)
+                print(f"{project_id}: failed, left in place: {e}")
+                stats["failed"] += 1
+                continue
+            for source in moved:
+                shutil.rmtree(source, ignore_errors=True)
+            stats["moved"] += 1
+        finally:
+            lock.close()
+
+    if not dry_run:
+        print(f"Moved {stats['moved']} of {len(moves)} project(s)")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only list the projects that would be moved")
+    args = parser.parse_args(argv)
+    rebalance(project_storage, get_settings().JOB_JOURNAL_DIR, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
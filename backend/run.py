@@ -1,13 +1,36 @@
 import uvicorn
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from app.config import get_settings
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
-    ) 
\ No newline at end of file
+    settings = get_settings()
+
+    if settings.SERVER_MODE == "production":
+        if settings.WORKERS > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            # Let /metrics aggregate the values of all workers
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+        uvicorn.run(
+            "app.main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.WORKERS,
+            # uvloop and httptools are used when installed, asyncio and h11 otherwise
+            loop="auto",
+            http="auto",
+            access_log=False,
+            proxy_headers=True,
+            # In-flight jobs get this long to finish after SIGTERM
+            timeout_graceful_shutdown=int(settings.JOB_DRAIN_TIMEOUT),
+        )
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=True
+        )
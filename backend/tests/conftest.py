@@ -0,0 +1,32 @@
+import os
+
+from benchmarks.fake_supabase import FAKE_SUPABASE_KEY, FakeSupabase
+
+# Settings are read when the app modules are imported
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", FAKE_SUPABASE_KEY)
+
+import pytest
+from supabase import create_client
+
+from benchmarks.harness import ServerThread
+
+
+@pytest.fixture(scope="session")
+def fake_supabase_server():
+    fake = FakeSupabase()
+    server = ServerThread(fake.app).start()
+    yield fake, server
+    server.stop()
+
+
+@pytest.fixture
+def fake_supabase(fake_supabase_server, monkeypatch):
+    """An empty fake Supabase that DatabaseContext talks to"""
+    import app.database
+
+    fake, server = fake_supabase_server
+    fake.tables.clear()
+    fake.client = create_client(server.url, FAKE_SUPABASE_KEY)
+    monkeypatch.setattr(app.database, "supabase", fake.client)
+    return fake
@@ -0,0 +1,194 @@
+import asyncio
+import glob
+import json
+import os
+from types import SimpleNamespace
+
+from app.jobs import JobJournal, JobManager, read_journal
+
+
+def write_journal(directory, entries):
+    path = os.path.join(directory, "jobs-1-dead.jsonl")
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps({"ts": 0, **entry}) + "\n")
+    return path
+
+
+def make_dir(path, content):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "app.txt"), "w") as f:
+        f.write(content)
+
+
+def read(path):
+    with open(os.path.join(path, "app.txt")) as f:
+        return f.read()
+
+
+def interrupted_edit(job_id, project_id, project_dir, restore_dir, user_id="user"):
+    return [
+        {"job_id": job_id, "phase": "queued", "operation": "edit", "project_id": project_id, "user_id": user_id},
+        {"job_id": job_id, "phase": "started", "project_dir": project_dir, "dir_existed": True, "restore_dir": restore_dir},
+        {"job_id": job_id, "phase": "generating"},
+    ]
+
+
+async def open_and_drain(journal_dir):
+    manager = JobManager()
+    await manager.open(journal_dir)
+    await manager.drain(timeout=1)
+
+
+def test_new_journal_is_locked_and_not_orphaned(tmp_path):
+    first = JobJournal(str(tmp_path))
+    second = JobJournal(str(tmp_path))
+    assert glob.glob(os.path.join(tmp_path, ".*.tmp")) == []
+    assert second.orphaned_journals() == []
+    first.close(remove=True)
+    assert [path for path, _ in second.orphaned_journals()] == []
+    second.close(remove=True)
+
+
+def test_recover_restores_backup_and_fails_project(tmp_path, fake_supabase):
+    project = fake_supabase.insert_rows("projects", [{"user_id": "user", "name": "P"}])[0]
+    project_dir, backup_dir = str(tmp_path / "project"), str(tmp_path / "backup")
+    make_dir(project_dir, "half edited")
+    make_dir(backup_dir, "v1")
+    journal_dir = str(tmp_path / "journal")
+    os.makedirs(journal_dir)
+    path = write_journal(journal_dir, interrupted_edit("job", project["id"], project_dir, backup_dir))
+
+    asyncio.run(open_and_drain(journal_dir))
+
+    assert read(project_dir) == "v1"
+    assert project["status"] == "Failed"
+    assert fake_supabase.tables["chat_messages"][0]["type"] == "error"
+    assert not os.path.exists(path)
+
+
+def test_recover_deleted_project_counts_as_recovered(tmp_path, fake_supabase):
+    project_dir, backup_dir = str(tmp_path / "project"), str(tmp_path / "backup")
+    make_dir(project_dir, "half edited")
+    make_dir(backup_dir, "v1")
+    journal_dir = str(tmp_path / "journal")
+    os.makedirs(journal_dir)
+    path = write_journal(journal_dir, interrupted_edit("job", "deleted-project", project_dir, backup_dir))
+
+    asyncio.run(open_and_drain(journal_dir))
+
+    assert not os.path.exists(path)
+    assert "chat_messages" not in fake_supabase.tables
+
+
+def test_failed_recovery_never_rolls_back_twice(tmp_path, fake_supabase, monkeypatch):
+    import app.jobs
+
+    ok = fake_supabase.insert_rows("projects", [{"user_id": "user", "name": "Ok"}])[0]
+    broken = fake_supabase.insert_rows("projects", [{"user_id": "broken", "name": "Broken"}])[0]
+    ok_dir, ok_backup = str(tmp_path / "ok"), str(tmp_path / "ok_backup")
+    broken_dir, broken_backup = str(tmp_path / "broken"), str(tmp_path / "broken_backup")
+    for directory, backup in ((ok_dir, ok_backup), (broken_dir, broken_backup)):
+        make_dir(directory, "half edited")
+        make_dir(backup, "v1")
+    journal_dir = str(tmp_path / "journal")
+    os.makedirs(journal_dir)
+    path = write_journal(
+        journal_dir,
+        interrupted_edit("ok-job", ok["id"], ok_dir, ok_backup)
+        + interrupted_edit("broken-job", broken["id"], broken_dir, broken_backup, user_id="broken"),
+    )
+
+    real_get_db_context = app.jobs.get_db_context
+
+    def get_db_context(user_id):
+        if user_id == "broken":
+            raise RuntimeError("database unavailable")
+        return real_get_db_context(user_id)
+
+    monkeypatch.setattr(app.jobs, "get_db_context", get_db_context)
+    asyncio.run(open_and_drain(journal_dir))
+
+    # Both directories were rolled back once, the journal is kept for the broken job
+    assert read(ok_dir) == "v1" and read(broken_dir) == "v1"
+    jobs = read_journal(path)
+    assert jobs["ok-job"]["phase"] == "recovered"
+    assert jobs["broken-job"]["phase"] == "rolled_back"
+
+    # The user keeps working on both projects before the next restart
+    make_dir(ok_dir, "edited after recovery")
+    make_dir(broken_dir, "edited after recovery")
+    monkeypatch.setattr(app.jobs, "get_db_context", real_get_db_context)
+    asyncio.run(open_and_drain(journal_dir))
+
+    assert read(ok_dir) == "edited after recovery"
+    assert read(broken_dir) == "edited after recovery"
+    assert broken["status"] == "Failed"
+    assert not os.path.exists(path)
+
+
+def test_rollback_without_backup_is_reported(tmp_path, fake_supabase):
+    project = fake_supabase.insert_rows("projects", [{"user_id": "user", "name": "P"}])[0]
+    project_dir = str(tmp_path / "project")
+    make_dir(project_dir, "half edited")
+    journal_dir = str(tmp_path / "journal")
+    os.makedirs(journal_dir)
+    write_journal(journal_dir, interrupted_edit("job", project["id"], project_dir, ""))
+
+    asyncio.run(open_and_drain(journal_dir))
+
+    assert read(project_dir) == "half edited"
+    assert "could not be rolled back" in fake_supabase.tables["chat_messages"][0]["message"]
+
+
+def test_interrupted_regeneration_restores_previous_generation(tmp_path, fake_supabase, monkeypatch):
+    from app.api.endpoints import projects
+    from app.models.models import ChatMessage
+    from app.storage import ProjectStorage
+    import app.jobs
+
+    storage = ProjectStorage([str(tmp_path / "projects")], lock_dir=str(tmp_path / "locks"))
+    monkeypatch.setattr(app.jobs, "project_storage", storage)
+    monkeypatch.setattr(projects, "project_storage", storage)
+    project = fake_supabase.insert_rows("projects", [{"user_id": "user", "name": "P", "status": "Ready"}])[0]
+    project_dir = storage.project_dir(project["id"])
+    make_dir(project_dir, "v1")
+    backup_dir = storage.snapshot(project_dir)
+    version = fake_supabase.insert_rows("versions", [{
+        "project_id": project["id"], "version_number": 1, "status": "generated", "backup_dir": backup_dir,
+    }])[0]
+    project["current_version_id"] = version["id"]
+
+    class CrashingCli:
+        @staticmethod
+        async def createAPI(description, output_dir, broadcast_callback, use_docker, use_nginx):
+            make_dir(output_dir, "half generated")
+            # The worker is killed mid-generation
+            raise asyncio.CancelledError()
+
+    async def load_cli():
+        return CrashingCli
+
+    monkeypatch.setattr(projects, "load_cli", load_cli)
+    journal_dir = str(tmp_path / "journal")
+
+    async def regenerate():
+        manager = JobManager()
+        await manager.open(journal_dir)
+        monkeypatch.setattr(projects, "job_manager", manager)
+        message = ChatMessage(project_id=project["id"], sender="user", message="Regenerate")
+        try:
+            await projects.generate_project(project["id"], message, SimpleNamespace(id="user"))
+        except asyncio.CancelledError:
+            pass
+        # The dead worker's journal is unlocked but left in place
+        manager.journal.file.close()
+
+    asyncio.run(regenerate())
+    assert read(project_dir) == "half generated"
+
+    asyncio.run(open_and_drain(journal_dir))
+
+    assert read(project_dir) == "v1"
+    assert project["status"] == "Failed"
+    assert "could not be rolled back" not in fake_supabase.tables["chat_messages"][-1]["message"]
@@ -0,0 +1,103 @@
+import asyncio
+import io
+import os
+import tarfile
+from types import SimpleNamespace
+
+from app.api.endpoints.projects import _update_preview
+from app.preview import _changed_files_tar, preview_sync, rebuild_reason
+
+
+def changes(added=(), removed=(), modified=()):
+    return {
+        "added": [{"path": path, "size": 1} for path in added],
+        "removed": [{"path": path, "size": 1} for path in removed],
+        "modified": [{"path": path, "old_size": 1, "new_size": 1} for path in modified],
+    }
+
+
+def test_source_changes_are_hot_applied():
+    assert rebuild_reason(changes(added=["src/App.tsx"], removed=["src/old.css"], modified=["index.html"])) is None
+    assert rebuild_reason(changes()) is None
+    # Only exact dependency file names count, not files that merely contain them
+    assert rebuild_reason(changes(modified=["src/package.json.ts", "docs/docker-setup.md"])) is None
+
+
+def test_dependency_and_docker_changes_need_a_rebuild():
+    assert rebuild_reason(changes(modified=["src/App.tsx", "package.json"])) == "package.json"
+    assert rebuild_reason(changes(added=["backend/requirements.txt"])) == "backend/requirements.txt"
+    assert rebuild_reason(changes(removed=["yarn.lock"])) == "yarn.lock"
+    assert rebuild_reason(changes(modified=["Dockerfile.dev"])) == "Dockerfile.dev"
+    assert rebuild_reason(changes(modified=["docker-compose.yml"])) == "docker-compose.yml"
+
+
+def test_tar_contains_only_changed_files_at_their_relative_paths(tmp_path):
+    for path, content in {
+        "src/components/deep/Button.tsx": "button",
+        "src/App.tsx": "app",
+        "src/unchanged.tsx": "same",
+    }.items():
+        full_path = tmp_path / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(content)
+
+    archive = _changed_files_tar(str(tmp_path), ["src/components/deep/Button.tsx", "src/App.tsx"])
+
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        assert sorted(tar.getnames()) == ["src/App.tsx", "src/components/deep/Button.tsx"]
+        assert tar.extractfile("src/components/deep/Button.tsx").read() == b"button"
+        extract_dir = tmp_path / "container"
+        tar.extractall(extract_dir)
+    assert (extract_dir / "src" / "components" / "deep" / "Button.tsx").read_text() == "button"
+    assert not os.path.exists(extract_dir / "src" / "unchanged.tsx")
+
+
+class FakeJob:
+    def enter_phase(self, phase):
+        pass
+
+    def preview_ready(self, mode, **details):
+        return {"mode": mode, **details}
+
+
+class FakeCli:
+    async def revertAPI(self, project_dir, backup_dir, broadcast_callback, use_docker, use_nginx):
+        assert use_docker
+        return {"status": "success", "preview_url": "http://localhost:3007"}
+
+
+def update_preview(old_manifest, new_manifest, hot):
+    project = {"id": "project", "current_project_preview_url": "http://localhost:3006"}
+    # Without docker the generator reports the local dev server
+    result = {"status": "success", "preview_url": "http://localhost:5173"}
+
+    async def status_callback(message):
+        pass
+
+    return asyncio.run(_update_preview(FakeJob(), FakeCli(), project, result, old_manifest, new_manifest, hot, status_callback))
+
+
+def manifest(root, files):
+    return {"root": str(root), "files": {path: {"size": 1, "hash": content} for path, content in files.items()}}
+
+
+def test_hot_apply_keeps_the_container_preview_url(tmp_path, monkeypatch):
+    async def apply(project_id, source_dir, changes):
+        return len(changes["modified"])
+
+    monkeypatch.setattr(preview_sync, "apply", apply)
+    old, new = manifest(tmp_path, {"src/App.tsx": "a"}), manifest(tmp_path, {"src/App.tsx": "b"})
+
+    preview, url = update_preview(old, new, hot=True)
+
+    assert preview == {"mode": "hot", "files": 1}
+    assert url == "http://localhost:3006"
+
+
+def test_rebuild_fallback_uses_the_rebuilt_preview_url(tmp_path):
+    old, new = manifest(tmp_path, {"package.json": "a"}), manifest(tmp_path, {"package.json": "b"})
+
+    preview, url = update_preview(old, new, hot=True)
+
+    assert preview == {"mode": "rebuild", "reason": "package.json"}
+    assert url == "http://localhost:3007"
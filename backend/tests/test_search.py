@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+from benchmarks.fake_cli import cli as fake_cli
+
+
+def test_search_after_an_edit(tmp_path, fake_supabase, monkeypatch):
+    from app.api.endpoints import projects, search
+    from app.jobs import JobManager
+    from app.models.models import ChatMessage
+    from app.storage import ProjectStorage
+    import app.jobs
+
+    monkeypatch.setenv("BENCH_CLI_SECONDS", "0")
+    monkeypatch.setenv("BENCH_CLI_FILES", "2")
+    storage = ProjectStorage([str(tmp_path / "projects")], lock_dir=str(tmp_path / "locks"))
+    monkeypatch.setattr(app.jobs, "project_storage", storage)
+    monkeypatch.setattr(projects, "project_storage", storage)
+
+    async def load_cli():
+        return fake_cli
+
+    monkeypatch.setattr(projects, "load_cli", load_cli)
+    project = fake_supabase.insert_rows("projects", [{"user_id": "user", "name": "Sales dashboard", "status": "Ready"}])[0]
+    user = SimpleNamespace(id="user")
+
+    async def edit_and_search():
+        manager = JobManager()
+        await manager.open(str(tmp_path / "journal"))
+        monkeypatch.setattr(projects, "job_manager", manager)
+        message = ChatMessage(project_id=project["id"], sender="user", message="Add a revenue chart")
+        await projects.edit_project(project["id"], message, user)
+        await manager.drain(timeout=1)
+        return await search.search(q="revenue", limit=20, offset=0, current_user=user)
+
+    response = asyncio.run(edit_and_search())
+
+    # The edit stores its completion message as a dict, search still matches the plain text messages
+    assert any(not isinstance(row["message"], str) for row in fake_supabase.tables["chat_messages"])
+    assert response["status"] == "success"
+    assert [result["kind"] for result in response["data"]["results"]] == ["chat_message"]
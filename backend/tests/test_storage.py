@@ -0,0 +1,192 @@
+import json
+import os
+import uuid
+
+import pytest
+
+import rebalance_storage
+from app.storage import TMP_SUFFIX, ProjectStorage
+
+
+def make_project(path, content="v1"):
+    os.makedirs(os.path.join(path, "src"), exist_ok=True)
+    with open(os.path.join(path, "src", "app.txt"), "w") as f:
+        f.write(content)
+
+
+def read(path):
+    with open(os.path.join(path, "src", "app.txt")) as f:
+        return f.read()
+
+
+@pytest.fixture
+def roots(tmp_path):
+    return [str(tmp_path / "disk1"), str(tmp_path / "disk2")]
+
+
+@pytest.fixture
+def lock_dir(tmp_path):
+    return str(tmp_path / "locks")
+
+
+def test_project_dir_uses_two_level_fanout(roots, lock_dir):
+    storage = ProjectStorage(roots[:1], lock_dir)
+    project_dir = storage.project_dir("project")
+    relative = os.path.relpath(project_dir, roots[0]).split(os.sep)
+    assert len(relative) == 3 and relative[2] == "project"
+    assert all(len(part) == 2 for part in relative[:2])
+    assert storage.project_dir("project") == project_dir
+
+
+def test_adding_a_root_only_moves_projects_to_it(roots, lock_dir):
+    one = ProjectStorage(roots[:1], lock_dir)
+    ids = [str(uuid.uuid4()) for _ in range(50)]
+    for project_id in ids:
+        make_project(one.project_dir(project_id))
+    assert one.misplaced() == []
+
+    two = ProjectStorage(roots, lock_dir)
+    moves = two.misplaced()
+    assert 0 < len(moves) < len(ids)
+    assert all(move["target"].startswith(roots[1]) for move in moves)
+    # Unmoved projects are still found where they are
+    for project_id in ids:
+        assert os.path.isdir(two.locate(project_id))
+
+
+def test_iter_projects_groups_backups_and_finds_flat_layout(roots, lock_dir):
+    storage = ProjectStorage(roots[:1], lock_dir)
+    sharded = storage.project_dir("sharded")
+    make_project(sharded)
+    make_project(f"{sharded}_backup_1")
+    make_project(os.path.join(roots[0], "flat"))
+    make_project(os.path.join(roots[0], "flat_backup_2"))
+
+    found = sorted(storage.iter_projects())
+    assert found == sorted([("sharded", os.path.dirname(sharded)), ("flat", roots[0])])
+    assert storage.locate("flat") == os.path.join(roots[0], "flat")
+    assert [move["project_id"] for move in storage.misplaced()] == ["flat"]
+
+
+def test_move_copies_project_and_backups(roots, lock_dir):
+    storage = ProjectStorage(roots, lock_dir)
+    source = os.path.join(roots[0], "flat")
+    make_project(source)
+    make_project(f"{source}_backup_1", "backup")
+    make_project(os.path.join(roots[0], "flatter"))
+    target = os.path.dirname(storage.placement("flat"))
+
+    moved = storage.move("flat", roots[0], target)
+
+    assert moved == {
+        source: os.path.join(target, "flat"),
+        f"{source}_backup_1": os.path.join(target, "flat_backup_1"),
+    }
+    assert read(os.path.join(target, "flat_backup_1")) == "backup"
+    # Sources are left for the caller, unrelated projects are untouched
+    assert os.path.isdir(source)
+    assert not os.path.exists(os.path.join(target, "flatter"))
+
+
+def test_interrupted_move_is_ignored_and_redone(roots, lock_dir):
+    storage = ProjectStorage(roots, lock_dir)
+    source = os.path.join(roots[0], "flat")
+    make_project(source)
+    target = os.path.dirname(storage.placement("flat"))
+    partial = os.path.join(target, "flat" + TMP_SUFFIX)
+    os.makedirs(partial)
+
+    assert storage.locate("flat") == source
+    assert [project_id for project_id, _ in storage.iter_projects()] == ["flat"]
+
+    storage.move("flat", roots[0], target)
+    assert read(os.path.join(target, "flat")) == "v1"
+    assert not os.path.exists(partial)
+
+
+def test_lock_excludes_rebalance_while_in_use(roots, lock_dir):
+    storage = ProjectStorage(roots, lock_dir)
+    job = storage.lock("project")
+    other_job = storage.lock("project")
+    assert job is not None and other_job is not None
+    assert storage.lock("project", exclusive=True) is None
+    job.close()
+    other_job.close()
+
+    rebalance = storage.lock("project", exclusive=True)
+    assert rebalance is not None
+    assert storage.lock("project") is None
+    rebalance.close()
+
+
+@pytest.fixture
+def database(fake_supabase, monkeypatch):
+    monkeypatch.setattr(rebalance_storage, "supabase", fake_supabase.client)
+    return fake_supabase
+
+
+def seed(database, storage_root, project_id):
+    project_dir = os.path.join(storage_root, project_id)
+    backup_dir = f"{project_dir}_backup_1"
+    make_project(project_dir, "current")
+    make_project(backup_dir, "v1")
+    database.insert_rows("projects", [{"id": project_id, "user_id": "user", "name": "P", "current_project_dir": project_dir}])
+    database.insert_rows("versions", [{
+        "project_id": project_id,
+        "version_number": 1,
+        "backup_dir": backup_dir,
+        "manifest": {"root": backup_dir, "files": {}},
+    }])
+
+
+def test_rebalance_moves_files_and_rewrites_database(roots, lock_dir, tmp_path, database):
+    storage = ProjectStorage(roots, lock_dir)
+    seed(database, roots[0], "flat")
+
+    stats = rebalance_storage.rebalance(storage, str(tmp_path / "journal"))
+
+    assert stats == {"misplaced": 1, "moved": 1, "skipped": 0, "failed": 0}
+    new_dir = storage.placement("flat")
+    assert read(new_dir) == "current"
+    assert not os.path.exists(os.path.join(roots[0], "flat"))
+    assert not os.path.exists(os.path.join(roots[0], "flat_backup_1"))
+    assert database.tables["projects"][0]["current_project_dir"] == new_dir
+    version = database.tables["versions"][0]
+    assert version["backup_dir"] == f"{new_dir}_backup_1"
+    assert version["manifest"]["root"] == f"{new_dir}_backup_1"
+    # Running it again finds nothing left to do
+    assert rebalance_storage.rebalance(storage, str(tmp_path / "journal"))["misplaced"] == 0
+
+
+def test_rebalance_skips_projects_in_use(roots, lock_dir, tmp_path, database):
+    storage = ProjectStorage(roots, lock_dir)
+    seed(database, roots[0], "in-use")
+    seed(database, roots[0], "interrupted")
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    with open(journal_dir / "jobs-1-dead.jsonl", "w") as f:
+        f.write(json.dumps({"job_id": "job", "phase": "generating", "project_id": "interrupted"}) + "\n")
+
+    job_lock = storage.lock("in-use")
+    stats = rebalance_storage.rebalance(storage, str(journal_dir))
+    job_lock.close()
+
+    assert stats["skipped"] == 2 and stats["moved"] == 0
+    assert read(os.path.join(roots[0], "in-use")) == "current"
+    assert read(os.path.join(roots[0], "interrupted")) == "current"
+    assert storage.locate("in-use") == os.path.join(roots[0], "in-use")
+
+
+def test_rebalance_keeps_sources_when_database_update_fails(roots, lock_dir, tmp_path, database, monkeypatch):
+    storage = ProjectStorage(roots, lock_dir)
+    seed(database, roots[0], "flat")
+
+    def fail(project_id, moved):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(rebalance_storage, "update_database", fail)
+    stats = rebalance_storage.rebalance(storage, str(tmp_path / "journal"))
+
+    assert stats["failed"] == 1
+    assert storage.locate("flat") == os.path.join(roots[0], "flat")
+    assert storage.entries_in(os.path.dirname(storage.placement("flat")), "flat") == []
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from app.tracing import Tracer
+
+
+def settings(journal_dir, rate=1.0):
+    return SimpleNamespace(TRACE_SAMPLE_RATE=rate, TRACE_EXPORT_PATH="", JOB_JOURNAL_DIR=str(journal_dir))
+
+
+def test_runtime_sample_rate_is_shared_across_workers(tmp_path):
+    workers = [Tracer(refresh_interval=0.0), Tracer(refresh_interval=0.0)]
+    for worker in workers:
+        worker.configure(settings(tmp_path))
+
+    workers[0].set_sample_rate(0.25)
+    assert [worker.current_rate() for worker in workers] == [0.25, 0.25]
+
+    # A worker started later, e.g. after a crash, picks up the runtime rate too
+    restarted = Tracer(refresh_interval=0.0)
+    restarted.configure(settings(tmp_path))
+    assert restarted.current_rate() == 0.25
+
+
+def test_changed_setting_discards_an_older_runtime_rate(tmp_path):
+    worker = Tracer(refresh_interval=0.0)
+    worker.configure(settings(tmp_path))
+    worker.set_sample_rate(0.25)
+
+    restarted = Tracer(refresh_interval=0.0)
+    restarted.configure(settings(tmp_path, rate=0.5))
+    assert restarted.current_rate() == 0.5
+
+
+def test_rate_is_reread_at_most_once_per_interval(tmp_path):
+    workers = [Tracer(refresh_interval=60.0), Tracer(refresh_interval=60.0)]
+    for worker in workers:
+        worker.configure(settings(tmp_path))
+    assert workers[1].current_rate() == 1.0
+
+    workers[0].set_sample_rate(0.0)
+    assert workers[1].current_rate() == 1.0
+    workers[1]._checked -= 60.0
+    assert workers[1].current_rate() == 0.0
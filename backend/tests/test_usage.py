@@ -0,0 +1,18 @@
+import asyncio
+
+import app.usage
+from app.usage import UsageTracker
+
+
+def test_usage_with_unflushed_deltas_keeps_integer_counters(fake_supabase, monkeypatch):
+    monkeypatch.setattr(app.usage, "supabase", fake_supabase.client)
+    fake_supabase.insert_rows("usage_stats", [{"user_id": "user", "projects": 1, "generations": 1, "bytes_stored": 4096}])
+    tracker = UsageTracker()
+    tracker.record("user", projects=1)
+    tracker.record("user", edits=1, build_minutes=0.5, bytes_stored=81920)
+
+    usage = asyncio.run(tracker.get_usage("user"))
+
+    assert usage["projects"] == 2 and usage["edits"] == 1 and usage["bytes_stored"] == 86016
+    assert all(type(usage[name]) is int for name in ("projects", "generations", "edits", "reverts", "bytes_stored"))
+    assert usage["build_minutes"] == 0.5
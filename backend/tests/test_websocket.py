@@ -0,0 +1,53 @@
+import asyncio
+
+from app.websocket import WebSocketManager
+
+
+class FakeSocket:
+    """A client that answers every server ping, optionally not at all"""
+
+    def __init__(self, manager, answers_pings=True):
+        self.manager = manager
+        self.answers_pings = answers_pings
+        self.connection = None
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+        if message["type"] == "ping" and self.answers_pings:
+            self.manager.handle_message(self.connection, '{"type": "pong"}')
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def stream_then_wait(answers_pings):
+    manager = WebSocketManager(heartbeat_interval=0.2, idle_timeout=0.6, send_timeout=1.0)
+    socket = FakeSocket(manager, answers_pings)
+    socket.connection = await manager.connect(socket, "project")
+    # A generation streaming progress for longer than the idle timeout, then going quiet
+    for i in range(50):
+        await manager.broadcast_to_project("project", {"type": "loading", "progress": i})
+        await asyncio.sleep(0.02)
+    await asyncio.sleep(0.9)
+    return manager, socket
+
+
+def test_busy_stream_then_quiet_keeps_a_responsive_client():
+    manager, socket = asyncio.run(stream_then_wait(answers_pings=True))
+    assert socket.close_code is None
+    assert "project" in manager.active_connections
+    # Pings went out on schedule during the stream, not only once it went quiet
+    pings = [i for i, message in enumerate(socket.sent) if message["type"] == "ping"]
+    assert len(pings) >= 5
+    assert pings[0] < 50
+
+
+def test_unanswered_pings_close_the_connection():
+    manager, socket = asyncio.run(stream_then_wait(answers_pings=False))
+    assert socket.close_code == 1011
+    assert "project" not in manager.active_connections
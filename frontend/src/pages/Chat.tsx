@@ -171,6 +171,12 @@ const Chat = () => {
         try {
           const data = JSON.parse(event.data);
           console.log('WebSocket message received:', data);
+
+          // Answer server heartbeats so the connection is not reaped as idle
+          if (data.type === 'ping') {
+            ws.current?.send(JSON.stringify({ type: 'pong' }));
+            return;
+          }
           
           // Handle different message types
           if (data.type === 'status') {